@@ -1,13 +1,23 @@
-from database.DBInterface import iVectorDB
-from database.QDrantDB import QDrantVectorDB
-from embed.embedInterface import iEmbed
-from embed.openAIEmbed import OpenAIEmbed
-from model.modelInterface import iModel
-from model.GPT import GPT
-from scraper.iCrawler import iCrawler
-from scraper.crawler import Crawler
+from src.database.DBInterface import iVectorDB
+from src.database.QDrantDB import QDrantVectorDB
+from src.database.localDB import LocalVectorDB
+from src.database.collectionProfile import CollectionProfile, PROFILES
+from src.embed.embedInterface import iEmbed
+from src.embed.openAIEmbed import OpenAIEmbed
+from src.embed.hashEmbed import HashEmbed
+from src.embed.dedup import MinHashDeduplicator
+from src.embed.sparseEncoder import SparseEncoder
+from src.model.modelInterface import iAsyncModel
+from src.model.asyncGPT import AsyncGPT
+from src.model.completionCache import CompletionCache
+from src.model.contextAssembler import ContextAssembler
+from src.model.retrievalOrchestrator import RetrievalOrchestrator
+from src.model.mmrReranker import MMRReranker
+from src.scraper.iCrawler import iCrawler
+from src.scraper.crawler import Crawler
+from src.ingest.pipeline import IngestPipeline
 from multiprocessing import cpu_count
-from frontend import web_app
+from src.frontend import web_app
 
 import asyncio
 import os
@@ -15,7 +25,8 @@ import sys
 from time import perf_counter
 
 
-async def run(db: iVectorDB, embed: iEmbed, model: iModel, crawler: iCrawler):
+async def run(db: iVectorDB, embed: iEmbed, model: iAsyncModel, crawler: iCrawler,
+              profile: CollectionProfile=PROFILES["full"]):
     """
     Test function to show a static run through of the workflow of the application.  This function will create a new
     database collection crawl a webpage, create embeddings, save the embedding vectors and content, and perform a RAG
@@ -24,14 +35,16 @@ async def run(db: iVectorDB, embed: iEmbed, model: iModel, crawler: iCrawler):
     Args:
         db (iVectorDB): A database object that conforms to the iDB interface
         embed (iEmbed): An embed object that conforms to the iEmbed interface
-        model (iModel): A model object that conforms to the iModel interface
+        model (iAsyncModel): A model object that conforms to the iAsyncModel interface
         crawler (iCrawler):A crawler object that conforms to the iCrawler interface
+        profile (CollectionProfile): How the vectors of the collection are sized and quantized.  The embed object must
+            produce vectors of the profile dimensions.
     """
     prompt = "What is CVE-2024-29943?"
 
     start = perf_counter()
     collectionName = "asd"
-    db.createCollection(collectionName, 1536)
+    db.createCollection(collectionName, profile=profile)
 
     outputDir = "./data/"
     '''
@@ -40,33 +53,22 @@ async def run(db: iVectorDB, embed: iEmbed, model: iModel, crawler: iCrawler):
                   cores=4,
                   outputDirectory=outputDir)
     '''
-    embeddings = dict()
+    sparseEncoder = SparseEncoder()
+    pipeline = IngestPipeline(db, embed, collectionName, removeFiles=True, deduplicator=MinHashDeduplicator(),
+                              sparseEncoder=sparseEncoder)
+    stats = await pipeline.run(IngestPipeline.fileSource(f"{outputDir}/text/"))
+    print(f"Ingested {stats['documents']} documents as {stats['saved']} embeddings, dropping "
+          f"{stats['duplicates']} near-duplicate chunks, in {stats['seconds']:.2f}s")
 
-    for root, _, fileNames in os.walk(f"{outputDir}/text/"):
-        for fileName in fileNames:
-            with open(f'{root}/{fileName}', 'r', encoding="utf8") as file:
-                # chunk the contents of the file
-                embeddings.update(await embed.createEmbedding(file.read()))
+    # The question is embedded and searched while the HyDE draft is generated, and both results answered at once
+    orchestrator = RetrievalOrchestrator(db, embed, ContextAssembler(), sparseEncoder, maxHits=100,
+                                         reranker=MMRReranker(), topN=12, measureSavings=True)
+    response, stats = await orchestrator.answer(model, prompt, [collectionName], hyde=True)
+    print(f"Retrieved {stats['retrieved']} fused results, reranked to {stats['results']} and included "
+          f"{stats['included']} in {stats['seconds']:.2f}s, "
+          f"saving {stats['savedTokens']} context tokens")
 
-            os.remove(f'{root}/{fileName}')
-
-    if len(embeddings) > 0:
-        db.saveToDB(embeddings, collectionName)
-
-    promptEmbedding = list((await embed.createEmbedding(prompt, maxChunkSize=sys.maxsize,
-                                                 chunkOverlap=0,
-                                                 delimiter="\n"*50)).values())[0]
-    hydeResponse = model.hydePrompt(prompt)
-    hydeEmbedding = list((await embed.createEmbedding(hydeResponse, maxChunkSize=sys.maxsize,
-                                                 chunkOverlap=0,
-                                                 delimiter="\n"*50)).values())[0]
-
-    promptResults = db.queryDB(promptEmbedding, collectionNames=[collectionName], maxHits=50)
-    promptResponse = model.prompt(promptResults, prompt)
-    hydeResults = db.queryDB(hydeEmbedding, collectionNames=[collectionName], maxHits=50)
-    hydeResponse = model.prompt(hydeResults, prompt)
-
-    print(f"Prompt Response:\n{promptResponse}\nHyde Response:\n{hydeResponse}")
+    print(f"Response:\n{response}")
     print(f"Time: {perf_counter() - start}")
 
 if __name__ == "__main__":
@@ -74,8 +76,13 @@ if __name__ == "__main__":
     #if sys.version_info[0] == 3 and sys.version_info[1] >= 8 and sys.platform.startswith('win'):
     #    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+    # HashEmbed(profile.dimensions) can be used in place of OpenAIEmbed to run without the OpenAI embedding API, and
+    # LocalVectorDB("./data/vectors/") in place of QDrantVectorDB to run without a QDrant instance
+    #profile = PROFILES["compact"]
     #asyncio.run(run(QDrantVectorDB("129.21.21.11"),
-    #                OpenAIEmbed("text-embedding-3-small"),
-    #                GPT("You are an advanced subject matter expert on the field of cybersecurity", "gpt-4-turbo-preview"),
-    #                Crawler))
+    #                OpenAIEmbed("text-embedding-3-small", dimensions=profile.dimensions),
+    #                AsyncGPT("You are an advanced subject matter expert on the field of cybersecurity",
+    #                         "gpt-4-turbo-preview", cache=CompletionCache("./data/completions.sqlite")),
+    #                Crawler,
+    #                profile))
     web_app.run()
\ No newline at end of file
@@ -1,5 +1,10 @@
 from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterator
 from qdrant_client.http.models import ScoredPoint
+from ..embed.embeddingBatch import EmbeddingBatch
+from ..embed.sparseEncoder import SparseVector
+from .pointIds import chunkHash
+from .collectionProfile import CollectionProfile
 
 class iVectorDB(ABC):
     """
@@ -7,29 +12,134 @@ class iVectorDB(ABC):
     All databases defined for use with this application should confirm to this interface"
     """
     @abstractmethod
-    def createCollection(self, collectionName: str, size: int):
+    def createCollection(self, collectionName: str, size: int=None, profile: CollectionProfile=None):
         """
         Create a new collection to store objects in a database
         Args:
             collectionName (str): The identifier for the collection to create.
-            size (int): The size of the vectors to be stored in the collection.
+            size (int): The size of the vectors to be stored in the collection.  Defaults to the dimensions of the
+                profile.
+            profile (CollectionProfile): How the vectors of the collection are sized and stored.  The embedding model
+                saving to the collection must produce vectors of the profile dimensions.
         """
         pass
 
     @abstractmethod
-    def saveToDB(self, texts: dict[str, list[float]], collectionName: str):
+    def saveToDB(self, batch: EmbeddingBatch, collectionName: str):
         """
         Saves a collection of text-embedding combinations to the database under a specified collection
         Args:
-            texts (dict[str, list[float]]): A dictionary with the keys being a text and the value being the embedding vector representing
-                the key.
+            batch (EmbeddingBatch): The chunks, their embedding vectors and their metadata.
             collectionName (str): The collection identifier to store the strings under.
         """
         pass
 
+    @abstractmethod
+    def getDocumentHashes(self, collectionName: str, source: str) -> set[str]:
+        """
+        Retrieves the manifest of a document, the content hashes of every chunk stored for it.
+
+        Args:
+            collectionName (str): The collection identifier to search.
+            source (str): The source document, matching the source metadata the chunks were saved with.
+
+        Returns:
+            set[str]: The content hashes of the chunks of the document, see pointIds.chunkHash.
+        """
+        pass
+
+    @abstractmethod
+    def getCatalog(self, refresh: bool=False) -> dict[str, int]:
+        """
+        Retrieves the collections in the database and the size of the vectors they hold.
+
+        Args:
+            refresh (bool): If True, a database that caches its catalog reads it again.
+
+        Returns:
+            dict[str, int]: The collection identifiers mapped to the size of their vectors.
+        """
+        pass
+
+    @abstractmethod
+    def iterateCollection(self, collectionName: str, batchSize: int=1024) -> Iterator[EmbeddingBatch]:
+        """
+        Reads every point of a collection in batches, used to export collections.
+
+        Args:
+            collectionName (str): The collection identifier to read.
+            batchSize (int): The amount of points read at once.
+
+        Returns:
+            Iterator[EmbeddingBatch]: The chunks, their embedding vectors and their payload fields as metadata.
+        """
+        pass
+
+    @abstractmethod
+    def deleteDocumentChunks(self, collectionName: str, source: str, contentHashes: set[str]):
+        """
+        Deletes chunks of a document from a collection.
+
+        Args:
+            collectionName (str): The collection identifier to delete from.
+            source (str): The source document of the chunks.
+            contentHashes (set[str]): The content hashes of the chunks to delete.
+        """
+        pass
+
+    def addWriteListener(self, listener: Callable[[str], None]):
+        """
+        Registers a function called with the identifier of a collection whenever points are saved to or deleted from
+        it through this instance, so caches built from the collection can be invalidated.
+
+        Args:
+            listener (Callable[[str], None]): The function to call.
+        """
+        if not hasattr(self, "writeListeners"):
+            self.writeListeners = []
+        self.writeListeners.append(listener)
+
+    def _notifyWrite(self, collectionName: str):
+        """
+        Calls the write listeners after a collection was written to.
+
+        Args:
+            collectionName (str): The identifier of the collection that was written to.
+        """
+        for listener in getattr(self, "writeListeners", ()):
+            listener(collectionName)
+
+    def syncDocument(self, batch: EmbeddingBatch, collectionName: str, source: str) -> dict[str, int]:
+        """
+        Re-indexes a document incrementally.  Only chunks missing from the document manifest are saved and chunks that
+        are no longer part of the document are deleted, so unchanged chunks are left untouched.
+
+        Args:
+            batch (EmbeddingBatch): Every chunk of the current version of the document.
+            collectionName (str): The collection identifier to store the document under.
+            source (str): The source document, stored as the source metadata of every chunk.
+
+        Returns:
+            dict[str, int]: The amount of chunks added, left unchanged and deleted.
+        """
+        existing = self.getDocumentHashes(collectionName, source)
+        hashes = [chunkHash(text) for text in batch.texts]
+        new = [index for index, contentHash in enumerate(hashes) if contentHash not in existing]
+        stale = existing - set(hashes)
+
+        if new:
+            added = batch.select(new)
+            added.metadata["source"] = [source] * len(added)
+            self.saveToDB(added, collectionName)
+        if stale:
+            self.deleteDocumentChunks(collectionName, source, stale)
+
+        return {"added": len(new), "unchanged": len(batch) - len(new), "deleted": len(stale)}
+
     @abstractmethod
     def queryDB(self, embedding: list[float], collectionNames: list[str]=None, maxHits: int=100,
-                minSimilarity: float=0) -> list[ScoredPoint]:
+                minSimilarity: float=0, sparseQuery: SparseVector=None,
+                filter: dict[str, Any]=None, withVectors: bool=False) -> list[ScoredPoint]:
         """
         Queries the database for similar vectors to the provided embedding vector.
 
@@ -38,9 +148,14 @@ class iVectorDB(ABC):
             collectionNames (list[str]): A list of collection identifiers to search with the provided embedding.
             maxHits (int): The max amount of results to be returned yb the query.
             minSimilarity (float): The required minimum similarity to be returned by the query.
+            sparseQuery (SparseVector): The keywords of the query.  If given, the collections are also searched by
+                keyword and the keyword and embedding results are fused with reciprocal rank fusion.
+            filter (dict[str, Any]): Only returns chunks whose payload matches the filter, see database.filters.
+            withVectors (bool): If True, the results hold their embedding vector, such as for reranking them.
 
         Returns:
             list[ScoredPoint]: The first maxHits amount of results that meet the
-            minSimilarity threshold to the embedding query
+            minSimilarity threshold to the embedding query, merged across the collections and sorted by score.  Every
+            result holds the collection it was found in under its "collection" payload field, see fusion.tagCollection.
         """
         pass
@@ -1,116 +1,542 @@
 from qdrant_client import QdrantClient, models
-from qdrant_client.http.models import PointStruct, ScoredPoint
+from qdrant_client.http.models import ScoredPoint
 from .DBInterface import iVectorDB
+from ..embed.embeddingBatch import EmbeddingBatch
+from ..embed.sparseEncoder import SparseVector
+from .pointIds import batchIds, pointId
+from .collectionProfile import CollectionProfile
+from .fusion import reciprocalRankFusion, tagCollection
+from .filters import toQdrantFilter
 from grpc._channel import _InactiveRpcError
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+from typing import Any, Callable, Iterator
+import heapq
+import random
+import threading
+
+
+class BulkLoadError(Exception):
+    """
+    Raised when some batches of a bulk load still fail after being retried.  The batches that succeeded stay in the
+    database, so the load can be resumed by saving only the failed ranges again.
+    """
+    def __init__(self, failedRanges: list[tuple[int, int]], errors: list[Exception]):
+        """
+        Args:
+            failedRanges (list[tuple[int, int]]): The start and stop index of every batch that failed.
+            errors (list[Exception]): The last error raised by each failed batch.
+        """
+        super().__init__(f"{len(failedRanges)} batches failed to save: {failedRanges}")
+        self.failedRanges = failedRanges
+        self.errors = errors
+
 
 class QDrantVectorDB(iVectorDB):
     """
     Class representing a connection to an instance of a QDrant Vector Database
     """
-    def __init__(self, host: str):
+    # Payload fields indexed so filtered searches only visit the matching points.  The source field holds the URL of
+    # crawled documents and is also used to find the manifest of a document.
+    PAYLOAD_INDEXES = {
+        "source": models.PayloadSchemaType.KEYWORD,
+        "domain": models.PayloadSchemaType.KEYWORD,
+        "contentType": models.PayloadSchemaType.KEYWORD,
+        "crawledAt": models.PayloadSchemaType.INTEGER,
+        "cves": models.PayloadSchemaType.KEYWORD,
+        "cveYears": models.PayloadSchemaType.INTEGER,
+    }
+
+    def __init__(self, host: str, batchSize: int=256, workers: int=4, maxRetries: int=3, wait: bool=True,
+                 catalogTtl: float=60):
         """
         Constructor for database
         Args:
             host (str): The ip address of the qdrant instance. Can also specify ":memory:" to create an instance in
                 RAM. Due to the nature of databases, this is not recommended outside of testing.
+            batchSize (int): The amount of points sent in each upsert when saving.
+            workers (int): The amount of upserts sent in parallel when saving.
+            maxRetries (int): The amount of times a failed upsert is retried before the save fails.
+            wait (bool): If True, every upsert waits until QDrant has applied it.  If False, upserts return as soon as
+                they are received, and waitForIndexing can be used to wait for the collection afterwards.
+            catalogTtl (float): The amount of seconds the cached list of collections and their vector sizes is reused
+                before it is fetched again.
         """
         self.client = QdrantClient(host=host, prefer_grpc=True, timeout=None)
+        self.batchSize = batchSize
+        self.workers = workers
+        self.maxRetries = maxRetries
+        self.wait = wait
+        self.catalogTtl = catalogTtl
+        self._catalog = dict()
+        self._profiles = dict()
+        self._sparse = set()
+        self._catalogUpdated = None
+        self._catalogLock = threading.Lock()
+        # Collections a refresh of the catalog did not find, with the time of that refresh
+        self._missing = dict()
+        # Shared between queries so searching several collections does not start new threads every time
+        self._searchExecutor = ThreadPoolExecutor(max_workers=8)
 
-    def createCollection(self, collectionName: str, size: int):
+    def createCollection(self, collectionName: str, size: int=None, profile: CollectionProfile=None):
         """
         Create a collection in the vector database.
 
         Args:
             collectionName (str): The identifier for the new collection.
-            size (int): The size of the embedding vectors that will be stored in the database.
+            size (int): The size of the embedding vectors that will be stored in the database.  Defaults to the
+                dimensions of the profile.
+            profile (CollectionProfile): How the vectors are sized and quantized.  Quantized collections keep a
+                compressed copy of the vectors in RAM for searching while the original vectors are kept on disk for
+                rescoring.  Defaults to full precision vectors.
+
+        Raises:
+            ValueError: If both a size and a profile are given and they disagree.
         """
+        profile, size = CollectionProfile.resolve(collectionName, size, profile)
+        quantized = profile.quantization is not None
         try:
             self.client.create_collection(
                 collection_name=collectionName,
                 vectors_config={"text embedding": models.VectorParams(
                     size=size,
-                    distance=models.Distance.COSINE
-                )}
+                    distance=models.Distance.COSINE,
+                    on_disk=quantized
+                )},
+                # Keyword vectors for hybrid search, QDrant applies the inverse document frequency of BM25 itself
+                sparse_vectors_config={"text sparse": models.SparseVectorParams(modifier=models.Modifier.IDF)},
+                quantization_config=QDrantVectorDB.quantizationConfig(profile)
             )
+            self.createPayloadIndexes(collectionName)
+            with self._catalogLock:
+                self._catalog[collectionName] = size
+                self._missing.pop(collectionName, None)
+                self._profiles[collectionName] = profile
+                self._sparse.add(collectionName)
         except _InactiveRpcError as error:
             if error.details() == f"Wrong input: Collection `{collectionName}` already exists!":
                 pass
             else:
                 raise error
 
+    def createPayloadIndexes(self, collectionName: str):
+        """
+        Indexes the payload fields of PAYLOAD_INDEXES.  Called when a collection is created, and can be called on
+        collections created before an index was added.
 
+        Args:
+            collectionName (str): The identifier of the collection to index.
+        """
+        for field, schema in QDrantVectorDB.PAYLOAD_INDEXES.items():
+            self.client.create_payload_index(collectionName, field, schema, wait=self.wait)
 
-    def convertToPoints(self, texts: dict[str, list[float]]) -> list[PointStruct]:
+    @staticmethod
+    def quantizationConfig(profile: CollectionProfile) -> models.QuantizationConfig | None:
         """
-        Converts a dictionary of text-embedding key-value pairs to a list of PointStructs to store in the DB.
+        Converts the quantization of a profile to its QDrant configuration.
 
         Args:
-            texts (dict[str, list[float]]): A text-embedding key-value dictionary to convert into PointStructs .
+            profile (CollectionProfile): The profile of the collection.
 
         Returns:
-            list: The texts passed in converted to PointStruct objects.
+            models.QuantizationConfig | None: The quantization configuration, or None for full precision vectors.
+        """
+        if profile.quantization == "scalar":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=profile.alwaysRam))
+        if profile.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=profile.alwaysRam))
+        return None
 
+    @staticmethod
+    def searchParams(profile: CollectionProfile) -> models.SearchParams | None:
         """
-        return [
-            PointStruct(id=idx,
-                        vector={"text embedding": embedding.result()},
-                        payload={"text": text},
-                        )
-            for idx, (embedding, text) in enumerate(zip(texts.values(), texts.keys()))
-        ]
+        Creates the search parameters of a collection, oversampling and rescoring when its vectors are quantized.
 
+        Args:
+            profile (CollectionProfile): The profile of the collection.
 
-    def saveToCollection(self, collectionName: str, points: list[PointStruct]):
+        Returns:
+            models.SearchParams | None: The search parameters, or None for full precision vectors.
         """
-        Save a list of points to the database under a specific collection.
+        if profile is None or profile.quantization is None:
+            return None
+        return models.SearchParams(quantization=models.QuantizationSearchParams(
+            rescore=profile.rescore, oversampling=profile.oversampling))
+
+
+
+    def convertToPoints(self, batch: EmbeddingBatch, ids: list[str]) -> models.Batch:
+        """
+        Converts an embedding batch to the column oriented batch format of QDrant, avoiding an object per point.  The
+        sparse vectors of the batch are included when it has them.
 
         Args:
+            batch (EmbeddingBatch): The chunks, their embedding vectors and their metadata.
+            ids (list[str]): The ID of each point in the batch.
+
+        Returns:
+            models.Batch: The batch in the format to store in the DB.
+
+        """
+        vectors = {"text embedding": batch.vectors.tolist()}
+        if batch.sparse is not None:
+            vectors["text sparse"] = [models.SparseVector(indices=vector.indices.tolist(), values=vector.values.tolist())
+                                      for vector in batch.sparse]
+        return models.Batch(ids=ids, vectors=vectors, payloads=batch.payloads())
+
+
+    def saveToCollection(self, collectionName: str, points: models.Batch, wait: bool=True):
+        """
+        Save a batch of points to the database under a specific collection.
+
+        Args:
+            collectionName (str): The identifier of the collection to save the points to.
+            points (models.Batch): A batch of points to save to the database
+            wait (bool): If True, wait until the points have been applied before returning.
+        """
+        self.client.upsert(collectionName, points, wait=wait)
+
+    def _saveRange(self, batch: EmbeddingBatch, ids: list[str], collectionName: str, start: int, stop: int) -> int:
+        """
+        Saves one range of a bulk load, retrying it on its own with jittered exponential backoff if it fails.
+
+        Args:
+            batch (EmbeddingBatch): The whole batch being loaded.
+            ids (list[str]): The point IDs of the whole batch.
             collectionName (str): The identifier of the collection to save the points to.
-            points (list[PointStruct]): A list of PointStructs to save to the database
+            start (int): The index of the first point of the range.
+            stop (int): The index after the last point of the range.
+
+        Returns:
+            int: The amount of retries that were needed.
         """
-        self.client.upsert(collectionName, points)
+        points = self.convertToPoints(batch.slice(start, stop), ids[start:stop])
+        for attempt in range(self.maxRetries + 1):
+            try:
+                self.saveToCollection(collectionName, points, wait=self.wait)
+                return attempt
+            except Exception as error:
+                if attempt == self.maxRetries:
+                    raise error
+                sleep(random.uniform(0, 0.5 * 2 ** attempt))
 
-    #Texts is a dict combo of text and embeddings output from an embedding model
-    def saveToDB(self, texts: dict[str, list[float]], collectionName: str):
+    def bulkLoad(self, batch: EmbeddingBatch, collectionName: str, ids: list[str],
+                 progress: Callable[[int, int, float], None]=None) -> dict[str, float]:
+        """
+        Saves a batch in ranges of batchSize points, sending up to workers ranges in parallel.  Every range is retried
+        on its own, so a failure does not restart the whole load.
+
+        Args:
+            batch (EmbeddingBatch): The chunks, their embedding vectors and their metadata.
+            collectionName (str): The identifier of the collection to save the points to.
+            ids (list[str]): The ID of each point.
+            progress (Callable[[int, int, float], None]): Called after every saved range with the amount of points
+                saved so far, the total amount of points and the elapsed seconds.
+
+        Returns:
+            dict[str, float]: The amount of points and batches saved, the amount of retries, the elapsed seconds and
+            the throughput in points per second.
+
+        Raises:
+            BulkLoadError: If some ranges still failed after being retried.  The error lists the failed ranges.
+        """
+        ranges = [(start, min(start + self.batchSize, len(batch))) for start in range(0, len(batch), self.batchSize)]
+        stats = {"points": 0, "batches": 0, "retries": 0, "seconds": 0.0, "pointsPerSecond": 0.0}
+        failedRanges = []
+        errors = []
+        lock = threading.Lock()
+        start = perf_counter()
+
+        def save(bounds: tuple[int, int]):
+            try:
+                retries = self._saveRange(batch, ids, collectionName, *bounds)
+            except Exception as error:
+                with lock:
+                    failedRanges.append(bounds)
+                    errors.append(error)
+                return
+
+            with lock:
+                stats["points"] += bounds[1] - bounds[0]
+                stats["batches"] += 1
+                stats["retries"] += retries
+                if progress:
+                    progress(stats["points"], len(batch), perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(save, ranges))
+
+        stats["seconds"] = perf_counter() - start
+        stats["pointsPerSecond"] = stats["points"] / stats["seconds"] if stats["seconds"] else 0.0
+        if failedRanges:
+            raise BulkLoadError(sorted(failedRanges), errors)
+        return stats
+
+    def waitForIndexing(self, collectionName: str, timeout: float=600, interval: float=1):
+        """
+        Waits until QDrant has finished applying and indexing the points of a collection, used after saving with
+        wait set to False.
+
+        Args:
+            collectionName (str): The identifier of the collection to wait for.
+            timeout (float): The maximum amount of seconds to wait.
+            interval (float): The amount of seconds between status checks.
+
+        Raises:
+            TimeoutError: If the collection is still being indexed after the timeout.
+        """
+        deadline = perf_counter() + timeout
+        while self.client.get_collection(collectionName).status != models.CollectionStatus.GREEN:
+            if perf_counter() > deadline:
+                raise TimeoutError(f"Collection {collectionName} was not indexed within {timeout} seconds")
+            sleep(interval)
+
+    def saveToDB(self, batch: EmbeddingBatch, collectionName: str):
         """
         Save a collection of text-embedding combinations to a collection in the database.
 
         Args:
-            texts (dict[str, list[float]]):  A text-embedding key-value dictionary to convert into PointStructs.
+            batch (EmbeddingBatch): The chunks, their embedding vectors and their metadata, as returned by the
+                embedding models.
             collectionName (str): The identifier of the collection to save the points to.
         """
-        points = self.convertToPoints(texts)
-        self.saveToCollection(collectionName, points)
+        if len(batch) == 0:
+            return
+        size = self.getCatalog().get(collectionName)
+        if size is not None and size != batch.dimensions:
+            raise ValueError(f"Collection {collectionName} holds {size} dimension vectors but the batch has "
+                             f"{batch.dimensions}, the embedding model and the collection profile disagree")
+        # IDs derived from the source and content make saving an unchanged chunk again overwrite its own point
+        ids, hashes = batchIds(batch)
+        batch = EmbeddingBatch(batch.texts, batch.vectors, {**batch.metadata, "chunkHash": hashes}, batch.sparse)
+        try:
+            self.bulkLoad(batch, collectionName, ids)
+        finally:
+            # Part of the batch may have been saved even if the load failed
+            self._notifyWrite(collectionName)
+
+    def getDocumentHashes(self, collectionName: str, source: str) -> set[str]:
+        """
+        Retrieves the manifest of a document, the content hashes of every chunk stored for it.
+
+        Args:
+            collectionName (str): The identifier of the collection to search.
+            source (str): The source document, matching the source metadata the chunks were saved with.
+
+        Returns:
+            set[str]: The content hashes of the chunks of the document.
+        """
+        hashes = set()
+        offset = None
+        documentFilter = models.Filter(must=[models.FieldCondition(key="source",
+                                                                   match=models.MatchValue(value=source))])
+        while True:
+            points, offset = self.client.scroll(collectionName, scroll_filter=documentFilter, limit=1024,
+                                                offset=offset, with_payload=["chunkHash"], with_vectors=False)
+            hashes.update(point.payload["chunkHash"] for point in points if "chunkHash" in point.payload)
+            if offset is None:
+                return hashes
+
+    def iterateCollection(self, collectionName: str, batchSize: int=1024) -> Iterator[EmbeddingBatch]:
+        """
+        Reads every point of a collection in batches by scrolling through it, used to export collections.
+
+        Args:
+            collectionName (str): The identifier of the collection to read.
+            batchSize (int): The amount of points read per request.
+
+        Returns:
+            Iterator[EmbeddingBatch]: The chunks, their embedding vectors and their payload fields as metadata.
+        """
+        offset = None
+        while True:
+            points, offset = self.client.scroll(collectionName, limit=batchSize, offset=offset, with_payload=True,
+                                                with_vectors=["text embedding"])
+            if points:
+                yield EmbeddingBatch.fromPayloads([point.payload for point in points],
+                                                  [point.vector["text embedding"] for point in points])
+            if offset is None:
+                return
+
+    def deleteDocumentChunks(self, collectionName: str, source: str, contentHashes: set[str]):
+        """
+        Deletes chunks of a document from a collection.
+
+        Args:
+            collectionName (str): The identifier of the collection to delete from.
+            source (str): The source document of the chunks.
+            contentHashes (set[str]): The content hashes of the chunks to delete.
+        """
+        self.client.delete(collectionName,
+                           points_selector=models.PointIdsList(points=[pointId(source, contentHash)
+                                                                       for contentHash in contentHashes]),
+                           wait=self.wait)
+        self._notifyWrite(collectionName)
 
     def queryDB(self, embedding: list[float],
-                collectionNames: list[str]=None, maxHits: int=100, minSimilarity: float=0) -> list[ScoredPoint]:
+                collectionNames: list[str]=None, maxHits: int=100, minSimilarity: float=0,
+                sparseQuery: SparseVector=None, filter: dict[str, Any]=None,
+                withVectors: bool=False) -> list[ScoredPoint]:
         """
         Queries the database for similar vectors to the provided embedding vector.
 
         Args:
             embedding (list): A list of embeddings to use for semantic searching in the vector database.
-            collectionNames (list): A list of collection identifiers to search with the provided embedding.
+            collectionNames (list): A list of collection identifiers to search with the provided embedding.  Defaults
+                to every collection.  Collections holding vectors of a different size than the embedding are skipped.
             maxHits (list): The max amount of results to be returned yb the query.
             minSimilarity (float): The required minimum similarity to be returned by the query.
+            sparseQuery (SparseVector): The keywords of the query, see SparseEncoder.encodeQuery.  If given, collections
+                with keyword vectors are also searched by keyword and both rankings are fused with reciprocal rank
+                fusion.
+            filter (dict[str, Any]): Only returns chunks whose payload matches the filter, see database.filters.
+                Indexed fields are filtered before the vectors are compared.
+            withVectors (bool): If True, the results hold their embedding vector as a list, without its name.
 
         Returns:
-            list: The first maxHits amount of results that meet the minSimilarity threshold to the embedding query
+            list: The first maxHits amount of results that meet the minSimilarity threshold to the embedding query,
+            merged across the collections and sorted by score.  Results of hybrid searches hold their fused score
+            instead of their similarity.  Every result holds its collection under the "collection" payload field.
+
+        Notes:
+            Both searches of a hybrid query are sent to QDrant in a single batch request.  The minimum similarity only
+            applies to the embedding search, keyword scores are not similarities.
+
+            In a hybrid query, collections without keyword vectors score their embedding results by rank fusion as
+            well, so the results of every collection are on the same scale when they are merged.
+
+            Quantized collections are searched with their compressed vectors, retrieving oversampling times maxHits
+            candidates that are then rescored with the original vectors, as set by the collection profile.
 
         TODO:
             Change to return normalized data instead of ScoredPoints
-        TODO:
-            Make sure to only search collections of the proper size
 
         """
-        results = []
-        if not collectionNames:
-            collectionNames = [collection['name'] for collection in self.client.get_collections().dict()['collections']]
+        catalog = self.getCatalog()
+        if collectionNames:
+            catalog = self._findCollections(collectionNames, catalog)
+
+        # Collections holding vectors of a different size cannot be searched with this embedding
+        collectionNames = [name for name in (collectionNames or catalog) if catalog.get(name) == len(embedding)]
+
+        queryFilter = toQdrantFilter(filter)
+
+        # Named vectors are returned as a dict of each name and vector, the caller expects the embedding itself
+        def unnamed(points: list[ScoredPoint]) -> list[ScoredPoint]:
+            for point in points:
+                if isinstance(point.vector, dict):
+                    point.vector = point.vector.get("text embedding")
+            return points
+
+        # Only the embedding is returned, the keyword vectors are of no use to the caller
+        vectors = ["text embedding"] if withVectors else False
+
+        hybrid = sparseQuery is not None and len(sparseQuery) > 0
+
+        def search(collection: str) -> list[ScoredPoint]:
+            searchParams = QDrantVectorDB.searchParams(self._profiles.get(collection))
+            if not hybrid or collection not in self._sparse:
+                points = tagCollection(unnamed(self.client.search(collection_name=collection,
+                                                                  query_vector=("text embedding", embedding),
+                                                                  limit=maxHits,
+                                                                  score_threshold=minSimilarity,
+                                                                  search_params=searchParams,
+                                                                  query_filter=queryFilter,
+                                                                  with_vectors=vectors
+                                                                  )), collection)
+                return reciprocalRankFusion([points], maxHits) if hybrid else points
+
+            keywords = models.SparseVector(indices=sparseQuery.indices.tolist(), values=sparseQuery.values.tolist())
+            rankings = self.client.search_batch(collection_name=collection, requests=[
+                models.SearchRequest(vector=models.NamedVector(name="text embedding", vector=embedding),
+                                     limit=maxHits, score_threshold=minSimilarity, params=searchParams,
+                                     filter=queryFilter, with_payload=True, with_vector=vectors),
+                models.SearchRequest(vector=models.NamedSparseVector(name="text sparse", vector=keywords),
+                                     limit=maxHits, filter=queryFilter, with_payload=True, with_vector=vectors)
+            ])
+            return tagCollection(unnamed(reciprocalRankFusion(rankings, maxHits)), collection)
+
+        if len(collectionNames) == 1:
+            return search(collectionNames[0])
+
+        results = self._searchExecutor.map(search, collectionNames)
+        return heapq.nlargest(maxHits, (point for points in results for point in points), key=lambda point: point.score)
+
+    @staticmethod
+    def _quantizationName(config: models.QuantizationConfig | None) -> str | None:
+        """
+        Names the quantization of a collection created outside this instance, so it is searched with rescoring.
 
-        for collection in collectionNames:
-            results.append(self.client.search(collection_name=collection,
-                                              query_vector=("text embedding", embedding.result()),
-                                              limit=maxHits,
-                                              score_threshold=minSimilarity
-                                              ))
+        Args:
+            config (models.QuantizationConfig | None): The quantization configuration of the collection.
 
-        return results
+        Returns:
+            str | None: The quantization as named by CollectionProfile.
+        """
+        if isinstance(config, models.ScalarQuantization):
+            return "scalar"
+        if isinstance(config, models.BinaryQuantization):
+            return "binary"
+        return None
+
+    def _findCollections(self, collectionNames: list[str], catalog: dict[str, int]) -> dict[str, int]:
+        """
+        Refreshes the catalog if it is missing a collection, which may have been created by another client.  A
+        collection the refresh does not find either is remembered as missing for catalogTtl seconds, so queries on a
+        collection that does not exist do not list the collections every time.
+
+        Args:
+            collectionNames (list[str]): The collections that are searched.
+            catalog (dict[str, int]): The cached catalog.
+
+        Returns:
+            dict[str, int]: The catalog, refreshed if it was missing a collection that was not known to be missing.
+        """
+        now = perf_counter()
+        with self._catalogLock:
+            unknown = [name for name in collectionNames if name not in catalog
+                       and now - self._missing.get(name, float("-inf")) >= self.catalogTtl]
+        if not unknown:
+            return catalog
+
+        catalog = self.getCatalog(refresh=True)
+        now = perf_counter()
+        with self._catalogLock:
+            self._missing = {name: checked for name, checked in self._missing.items()
+                             if now - checked < self.catalogTtl}
+            self._missing.update((name, now) for name in unknown if name not in catalog)
+        return catalog
+
+    def getCatalog(self, refresh: bool=False) -> dict[str, int]:
+        """
+        Retrieves the collections in the database and the size of the vectors they hold.  The catalog is cached for
+        catalogTtl seconds so queries do not have to list the collections every time.
+
+        Args:
+            refresh (bool): If True, the catalog is fetched again even if the cached copy has not expired.
+
+        Returns:
+            dict[str, int]: The collection identifiers mapped to the size of their vectors.
+        """
+        with self._catalogLock:
+            if refresh or self._catalogUpdated is None or perf_counter() - self._catalogUpdated > self.catalogTtl:
+                catalog = dict()
+                profiles = dict()
+                sparse = set()
+                for collection in self.client.get_collections().collections:
+                    config = self.client.get_collection(collection.name).config
+                    vectors = config.params.vectors
+                    if isinstance(vectors, dict) and "text embedding" in vectors:
+                        catalog[collection.name] = vectors["text embedding"].size
+                        profiles[collection.name] = self._profiles.get(collection.name) or CollectionProfile(
+                            collection.name, catalog[collection.name],
+                            QDrantVectorDB._quantizationName(vectors["text embedding"].quantization_config
+                                                             or config.quantization_config))
+                        if config.params.sparse_vectors and "text sparse" in config.params.sparse_vectors:
+                            sparse.add(collection.name)
+                self._catalog = catalog
+                self._profiles = profiles
+                self._sparse = sparse
+                self._catalogUpdated = perf_counter()
+            return dict(self._catalog)
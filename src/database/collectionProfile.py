@@ -0,0 +1,72 @@
+class CollectionProfile:
+    """
+    Describes how the vectors of a collection are sized and stored.  The same profile is given to the embedding model,
+    which requests vectors of the profile dimensions, and to the database, which creates the collection with the
+    profile dimensions and quantization, so the two layers always agree.
+    """
+    QUANTIZATIONS = (None, "scalar", "binary")
+
+    def __init__(self, name: str, dimensions: int=1536, quantization: str=None, oversampling: float=2.0,
+                 rescore: bool=True, alwaysRam: bool=True):
+        """
+        Constructor for a profile.
+
+        Args:
+            name (str): The identifier of the profile.
+            dimensions (int): The size of the vectors.  text-embedding-3 models can shorten their vectors to any size
+                up to their native size through the dimensions parameter of the API.
+            quantization (str): None for full precision float32 vectors, "scalar" for int8 vectors using a quarter of
+                the memory, or "binary" for one bit per dimension using a thirty-second of the memory.
+            oversampling (float): How many times maxHits candidates are retrieved with the quantized vectors before
+                they are rescored.
+            rescore (bool): If True, the candidates found with the quantized vectors are rescored with the original
+                vectors.
+            alwaysRam (bool): If True, the quantized vectors are kept in RAM while the original vectors may be kept on
+                disk.
+        """
+        if quantization not in CollectionProfile.QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization}, expected one of {CollectionProfile.QUANTIZATIONS}")
+
+        self.name = name
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self.rescore = rescore
+        self.alwaysRam = alwaysRam
+
+    @staticmethod
+    def resolve(collectionName: str, size: int, profile: "CollectionProfile") -> tuple["CollectionProfile", int]:
+        """
+        Reconciles the size and profile arguments given when creating a collection.
+
+        Args:
+            collectionName (str): The identifier for the new collection.
+            size (int): The requested size of the vectors, or None.
+            profile (CollectionProfile): The requested profile, or None.
+
+        Returns:
+            tuple[CollectionProfile, int]: The profile and the size of the vectors of the collection.
+
+        Raises:
+            ValueError: If both are given and they disagree, or neither is given.
+        """
+        if profile is None:
+            if size is None:
+                raise ValueError(f"Collection {collectionName} needs a vector size or a profile")
+            return CollectionProfile(collectionName, size), size
+        if size is not None and size != profile.dimensions:
+            raise ValueError(f"Collection {collectionName} was given size {size} but profile {profile.name} has "
+                             f"{profile.dimensions} dimensions")
+        return profile, profile.dimensions
+
+    def __repr__(self) -> str:
+        return f"CollectionProfile({self.name}, {self.dimensions}, {self.quantization})"
+
+
+# Profiles for text-embedding-3-small, whose native size is 1536
+PROFILES = {
+    "full": CollectionProfile("full", 1536),
+    "scalar": CollectionProfile("scalar", 1536, "scalar", oversampling=2.0),
+    "binary": CollectionProfile("binary", 1536, "binary", oversampling=3.0),
+    "compact": CollectionProfile("compact", 512, "scalar", oversampling=2.0),
+}
@@ -0,0 +1,90 @@
+"""
+Filters narrow a query to the chunks whose payload matches every condition of the filter.  A filter is a dict mapping
+payload fields to a condition::
+
+    {"domain": "www.mozilla.org",                     # the field equals the value
+     "contentType": ["text/html", "application/pdf"], # the field equals any of the values
+     "crawledAt": {"gte": 1711929600},                # the field is within the range, using gt, gte, lt and lte
+     "cveYears": 2024}
+
+Fields holding a list, such as cves and cveYears, match if any of their values match.
+"""
+from qdrant_client import models
+from typing import Any
+import re
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+FIELD_PATTERN = re.compile(r"^\w+$")
+SQL_OPERATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _conditions(filter: dict[str, Any]) -> list[tuple[str, Any]]:
+    """
+    Validates a filter.
+
+    Args:
+        filter (dict[str, Any]): The filter to validate.
+
+    Returns:
+        list[tuple[str, Any]]: The field and condition of every condition of the filter.
+
+    Raises:
+        ValueError: If a field name is not a plain identifier or a range uses an unknown operator.
+    """
+    for field, condition in filter.items():
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f"Invalid filter field {field}")
+        if isinstance(condition, dict) and (not condition or any(key not in RANGE_OPERATORS for key in condition)):
+            raise ValueError(f"Invalid range for {field}: {condition}, expected operators from {RANGE_OPERATORS}")
+    return list(filter.items())
+
+
+def toQdrantFilter(filter: dict[str, Any]) -> models.Filter | None:
+    """
+    Converts a filter to a QDrant filter.
+
+    Args:
+        filter (dict[str, Any]): The filter to convert.
+
+    Returns:
+        models.Filter | None: The QDrant filter, or None if the filter is empty.
+    """
+    if not filter:
+        return None
+
+    must = []
+    for field, condition in _conditions(filter):
+        if isinstance(condition, dict):
+            must.append(models.FieldCondition(key=field, range=models.Range(**condition)))
+        elif isinstance(condition, (list, tuple, set)):
+            must.append(models.FieldCondition(key=field, match=models.MatchAny(any=list(condition))))
+        else:
+            must.append(models.FieldCondition(key=field, match=models.MatchValue(value=condition)))
+    return models.Filter(must=must)
+
+
+def toSqliteCondition(filter: dict[str, Any], column: str="payload") -> tuple[str, list[Any]]:
+    """
+    Converts a filter to an SQLite condition on a column holding JSON payloads.
+
+    Args:
+        filter (dict[str, Any]): The filter to convert.
+        column (str): The column holding the payloads.
+
+    Returns:
+        tuple[str, list[Any]]: The condition and its parameters.  The condition is "1" if the filter is empty.
+    """
+    clauses = []
+    parameters = []
+    for field, condition in _conditions(filter or dict()):
+        # json_each yields every element of a list and the value itself for anything else
+        if isinstance(condition, dict):
+            where = " AND ".join(f"value {SQL_OPERATORS[operator]} ?" for operator in condition)
+            values = list(condition.values())
+        else:
+            values = list(condition) if isinstance(condition, (list, tuple, set)) else [condition]
+            where = f"value IN ({','.join('?' * len(values))})"
+        clauses.append(f"EXISTS (SELECT 1 FROM json_each({column}, ?) WHERE {where})")
+        parameters += [f"$.{field}"] + values
+
+    return (" AND ".join(clauses) if clauses else "1"), parameters
@@ -0,0 +1,50 @@
+from qdrant_client.http.models import ScoredPoint
+
+
+def tagCollection(points: list[ScoredPoint], collectionName: str) -> list[ScoredPoint]:
+    """
+    Records the collection of search results in their payload.  Point IDs are derived from the source and content of
+    a chunk, so the same chunk saved in two collections, such as a full precision and a quantized copy, has the same
+    ID in both, and the collection keeps them apart when rankings are fused.
+
+    Args:
+        points (list[ScoredPoint]): The results of a search.
+        collectionName (str): The collection that was searched.
+
+    Returns:
+        list[ScoredPoint]: The same results, with the collection under the "collection" payload field.
+    """
+    for point in points:
+        point.payload = dict(point.payload or {}, collection=collectionName)
+    return points
+
+
+def reciprocalRankFusion(rankings: list[list[ScoredPoint]], maxHits: int, k: int=60) -> list[ScoredPoint]:
+    """
+    Fuses several rankings of the same points, such as the embedding and keyword searches of one collection, into one
+    with reciprocal rank fusion.  Each point scores the sum of 1 / (k + rank) over the rankings it appears in, so only
+    the positions of the points are used and rankings with incomparable scores, such as cosine similarities and BM25
+    scores, can be combined.  Points are identified by their ID and the collection recorded by tagCollection, so
+    rankings spanning several collections, such as a direct and a HyDE search, only merge the same point of the same
+    collection.
+
+    Args:
+        rankings (list[list[ScoredPoint]]): The results of each search, sorted by score.
+        maxHits (int): The maximum amount of fused results.
+        k (int): Dampens the difference between the first ranks.  60 is the value used by the original paper.
+
+    Returns:
+        list[ScoredPoint]: The fused results sorted by their fused score, which replaces their original score.
+    """
+    scores = dict()
+    points = dict()
+    for ranking in rankings:
+        for rank, point in enumerate(ranking):
+            key = ((point.payload or {}).get("collection"), point.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            points.setdefault(key, point)
+
+    fused = sorted(scores, key=scores.get, reverse=True)[:maxHits]
+    for key in fused:
+        points[key].score = scores[key]
+    return [points[key] for key in fused]
@@ -0,0 +1,558 @@
+from qdrant_client.http.models import ScoredPoint
+from .DBInterface import iVectorDB
+from .pointIds import batchIds, pointId
+from .collectionProfile import CollectionProfile
+from .fusion import reciprocalRankFusion, tagCollection
+from .filters import toSqliteCondition
+from ..embed.embeddingBatch import EmbeddingBatch
+from ..embed.sparseEncoder import SparseVector
+from typing import Any, Iterator
+import heapq
+import json
+import numpy as np
+import os
+import sqlite3
+import threading
+
+
+class LocalCollection:
+    """
+    A single collection of a LocalVectorDB.  Vectors are L2 normalized and stored as rows of a memory-mapped float32
+    file, so cosine similarity is a matrix product.  Point IDs and payloads are stored in a SQLite side store that maps
+    each point to its row.  Deleted points keep their row but are masked out of searches.  Keyword vectors are stored
+    in an inverted index table of the side store.
+    """
+    def __init__(self, directory: str, size: int):
+        """
+        Opens a collection, creating its files if they do not exist.
+
+        Args:
+            directory (str): The directory holding the files of the collection.
+            size (int): The size of the vectors in the collection.
+        """
+        self.directory = directory
+        self.size = size
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(os.path.join(directory, "payloads.sqlite"), check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS points ("
+                                    "row INTEGER PRIMARY KEY, "
+                                    "id TEXT UNIQUE NOT NULL, "
+                                    "source TEXT, "
+                                    "chunkHash TEXT, "
+                                    "payload TEXT NOT NULL, "
+                                    "deleted INTEGER NOT NULL DEFAULT 0)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS pointsSource ON points (source)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS terms ("
+                                    "term INTEGER NOT NULL, "
+                                    "row INTEGER NOT NULL, "
+                                    "weight REAL NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS termsTerm ON terms (term)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS termsRow ON terms (row)")
+
+        self.rows = dict(self.connection.execute("SELECT id, row FROM points"))
+        self.count = self.connection.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM points").fetchone()[0]
+        self.deleted = np.zeros(self.count, dtype=bool)
+        for (row,) in self.connection.execute("SELECT row FROM points WHERE deleted = 1"):
+            self.deleted[row] = True
+
+        self.vectorPath = os.path.join(directory, "vectors.f32")
+        self.capacity = 0
+        self.vectors = None
+        self._reserve(max(1024, self.count))
+
+        self.centroids = None
+        self.lists = None
+
+    def _reserve(self, rows: int):
+        """
+        Grows the vector file so it can hold at least the given amount of rows, doubling its capacity to keep the
+        amount of resizes logarithmic.
+
+        Args:
+            rows (int): The amount of rows needed.
+        """
+        if rows <= self.capacity:
+            return
+
+        capacity = max(rows, self.capacity * 2)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self.vectorPath, "ab") as file:
+            file.truncate(capacity * self.size * 4)
+        self.vectors = np.memmap(self.vectorPath, dtype=np.float32, mode="r+", shape=(capacity, self.size))
+        self.capacity = capacity
+        if len(self.deleted) < capacity:
+            self.deleted = np.concatenate([self.deleted, np.zeros(capacity - len(self.deleted), dtype=bool)])
+
+    def upsert(self, batch: EmbeddingBatch):
+        """
+        Inserts the points of a batch, overwriting points that already exist with the same ID.  The keyword vectors of
+        the batch are indexed when it has them.
+
+        Args:
+            batch (EmbeddingBatch): The chunks, their embedding vectors and their metadata.
+        """
+        ids, hashes = batchIds(batch)
+        payloads = batch.payloads()
+        vectors = batch.vectors / np.maximum(np.linalg.norm(batch.vectors, axis=1, keepdims=True), 1e-12)
+
+        with self.lock:
+            rows = []
+            for id in ids:
+                if id not in self.rows:
+                    self.rows[id] = self.count
+                    self.count += 1
+                rows.append(self.rows[id])
+
+            self._reserve(self.count)
+            self.vectors[rows] = vectors
+            self.deleted[rows] = False
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO points (row, id, source, chunkHash, payload, deleted) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    [(row, id, payload.get("source"), contentHash, json.dumps({**payload, "chunkHash": contentHash}))
+                     for row, id, contentHash, payload in zip(rows, ids, hashes, payloads)])
+                self.connection.executemany("DELETE FROM terms WHERE row = ?", [(row,) for row in rows])
+                if batch.sparse is not None:
+                    self.connection.executemany(
+                        "INSERT INTO terms (term, row, weight) VALUES (?, ?, ?)",
+                        [(term, row, weight) for row, vector in zip(rows, batch.sparse)
+                         for term, weight in zip(vector.indices.tolist(), vector.values.tolist())])
+            self.vectors.flush()
+
+            if self.centroids is not None:
+                self._assign(np.asarray(rows), vectors)
+
+    def delete(self, ids: list[str]):
+        """
+        Deletes points from the collection.
+
+        Args:
+            ids (list[str]): The IDs of the points to delete.  Unknown IDs are ignored.
+        """
+        with self.lock:
+            rows = [self.rows[id] for id in ids if id in self.rows]
+            self.deleted[rows] = True
+            with self.connection:
+                self.connection.executemany("UPDATE points SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+                self.connection.executemany("DELETE FROM terms WHERE row = ?", [(row,) for row in rows])
+
+    def buildIndex(self, numLists: int=None, iterations: int=10, sampleSize: int=65536, seed: int=0):
+        """
+        Builds an inverted file (IVF) index by clustering the vectors with k-means.  Searches with the index only
+        compare the query against the vectors of the clusters whose centroids are closest to it.
+
+        Args:
+            numLists (int): The amount of clusters.  Defaults to the square root of the amount of points.
+            iterations (int): The amount of k-means iterations.
+            sampleSize (int): The maximum amount of vectors the clusters are trained on.
+            seed (int): The seed used to sample the vectors and initialize the clusters.
+        """
+        with self.lock:
+            live = np.flatnonzero(~self.deleted[:self.count])
+            if len(live) == 0:
+                return
+            numLists = min(len(live), numLists if numLists else max(1, int(np.sqrt(len(live)))))
+
+            generator = np.random.default_rng(seed)
+            sample = self.vectors[generator.choice(live, min(sampleSize, len(live)), replace=False)]
+            centroids = sample[generator.choice(len(sample), numLists, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for cluster in range(numLists):
+                    members = sample[assignment == cluster]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+            self.centroids = centroids
+            self.lists = [np.empty(0, dtype=np.int64) for _ in range(numLists)]
+            for start in range(0, len(live), sampleSize):
+                rows = live[start:start + sampleSize]
+                self._assign(rows, self.vectors[rows])
+
+    def _assign(self, rows: np.ndarray, vectors: np.ndarray):
+        """
+        Adds rows to the index lists of their closest centroids.  Must be called with the lock held.
+
+        Args:
+            rows (np.ndarray): The rows to add.
+            vectors (np.ndarray): The normalized vectors of the rows.
+        """
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for cluster in np.unique(assignment):
+            self.lists[cluster] = np.union1d(self.lists[cluster], rows[assignment == cluster])
+
+    def filterRows(self, filter: dict[str, Any]) -> np.ndarray:
+        """
+        Finds the points whose payload matches a filter.  Must be called with the lock held.
+
+        Args:
+            filter (dict[str, Any]): The filter to match, see database.filters.
+
+        Returns:
+            np.ndarray: The sorted rows of the matching points that are not deleted.
+        """
+        condition, parameters = toSqliteCondition(filter)
+        rows = self.connection.execute(f"SELECT row FROM points WHERE deleted = 0 AND {condition} ORDER BY row",
+                                       parameters).fetchall()
+        return np.fromiter((row for (row,) in rows), dtype=np.int64, count=len(rows))
+
+    def search(self, embedding: np.ndarray, maxHits: int, minSimilarity: float, probes: int,
+               filter: dict[str, Any]=None, withVectors: bool=False) -> list[ScoredPoint]:
+        """
+        Searches the collection for the vectors most similar to an embedding.
+
+        Args:
+            embedding (np.ndarray): The normalized query vector.
+            maxHits (int): The maximum amount of results.
+            minSimilarity (float): The minimum cosine similarity of the results.
+            probes (int): The amount of index clusters searched when an index has been built.
+            filter (dict[str, Any]): Only searches the points whose payload matches the filter.  If fewer points
+                match than the index clusters would return, the matching points are compared exhaustively.
+            withVectors (bool): If True, the results hold their normalized vector.
+
+        Returns:
+            list[ScoredPoint]: The results sorted by score.
+        """
+        with self.lock:
+            allowed = self.filterRows(filter) if filter else None
+            if self.centroids is not None or (allowed is not None and len(allowed) * 4 <= self.count):
+                if self.centroids is not None:
+                    closest = np.argsort(self.centroids @ embedding)[::-1][:probes]
+                    # A point re-saved with a different vector can appear in two lists
+                    candidates = np.unique(np.concatenate([self.lists[cluster] for cluster in closest]))
+                    if allowed is not None:
+                        candidates = allowed if len(allowed) <= len(candidates) else \
+                            np.intersect1d(candidates, allowed)
+                else:
+                    candidates = allowed
+                candidates = candidates[~self.deleted[candidates]]
+                scores = self.vectors[candidates] @ embedding
+                keep = scores >= minSimilarity
+                candidates, scores = candidates[keep], scores[keep]
+            else:
+                # Scores every point through a view of the memory map instead of gathering the rows into a copy, and
+                # masks out the deleted and filtered points afterwards
+                scores = self.vectors[:self.count] @ embedding
+                keep = (scores >= minSimilarity) & ~self.deleted[:self.count]
+                if allowed is not None:
+                    matches = np.zeros(self.count, dtype=bool)
+                    matches[allowed] = True
+                    keep &= matches
+                candidates = np.flatnonzero(keep)
+                scores = scores[candidates]
+
+            if len(scores) > maxHits:
+                top = np.argpartition(scores, -maxHits)[-maxHits:]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(scores)[::-1]
+            return self._points(candidates[order], scores[order], withVectors)
+
+    def keywordSearch(self, sparseQuery: SparseVector, maxHits: int,
+                      filter: dict[str, Any]=None, withVectors: bool=False) -> list[ScoredPoint]:
+        """
+        Searches the collection by keyword with BM25.  The inverse document frequency of each query term is calculated
+        from the inverted index, matching the IDF modifier of QDrant.
+
+        Args:
+            sparseQuery (SparseVector): The keywords of the query, see SparseEncoder.encodeQuery.
+            maxHits (int): The maximum amount of results.
+            filter (dict[str, Any]): Only returns the points whose payload matches the filter.
+            withVectors (bool): If True, the results hold their normalized vector.
+
+        Returns:
+            list[ScoredPoint]: The results sorted by score.
+        """
+        queryWeights = dict(zip(sparseQuery.indices.tolist(), sparseQuery.values.tolist()))
+        if not queryWeights:
+            return []
+        placeholders = ",".join("?" * len(queryWeights))
+        terms = list(queryWeights)
+
+        with self.lock:
+            points = self.count - int(self.deleted[:self.count].sum())
+            weights = dict()
+            for term, frequency in self.connection.execute(
+                    f"SELECT term, COUNT(*) FROM terms WHERE term IN ({placeholders}) GROUP BY term", terms):
+                idf = np.log(1 + (points - frequency + 0.5) / (frequency + 0.5))
+                weights[term] = idf * queryWeights[term]
+
+            condition, parameters = toSqliteCondition(filter, "points.payload")
+            matches = self.connection.execute(
+                f"SELECT terms.row, terms.term, terms.weight FROM terms JOIN points ON points.row = terms.row "
+                f"WHERE terms.term IN ({placeholders}) AND {condition}", terms + parameters).fetchall()
+            if not matches:
+                return []
+            rows = np.fromiter((row for row, _, _ in matches), dtype=np.int64, count=len(matches))
+            contributions = np.fromiter((weight * weights[term] for _, term, weight in matches), dtype=np.float64,
+                                        count=len(matches))
+            candidates, positions = np.unique(rows, return_inverse=True)
+            scores = np.bincount(positions, weights=contributions)
+
+            if len(scores) > maxHits:
+                top = np.argpartition(scores, -maxHits)[-maxHits:]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(scores)[::-1]
+            return self._points(candidates[order], scores[order], withVectors)
+
+    def _points(self, candidates: np.ndarray, scores: np.ndarray, withVectors: bool=False) -> list[ScoredPoint]:
+        """
+        Loads the IDs and payloads of search results.  Must be called with the lock held.
+
+        Args:
+            candidates (np.ndarray): The rows of the results.
+            scores (np.ndarray): The score of each result.
+            withVectors (bool): If True, the vectors of the results are loaded as well.
+
+        Returns:
+            list[ScoredPoint]: The results in the given order.
+        """
+        points = dict()
+        rows = [int(row) for row in candidates]
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            for row, id, payload in self.connection.execute(
+                    f"SELECT row, id, payload FROM points WHERE row IN ({','.join('?' * len(batch))})", batch):
+                points[row] = (id, payload)
+
+        return [ScoredPoint(id=points[row][0], version=0, score=float(score), payload=json.loads(points[row][1]),
+                            vector=self.vectors[row].tolist() if withVectors else None)
+                for row, score in zip(rows, scores)]
+
+    def iterate(self, batchSize: int) -> Iterator[EmbeddingBatch]:
+        """
+        Reads every point of the collection in batches, in the order they were first saved.
+
+        Args:
+            batchSize (int): The amount of points per batch.
+
+        Returns:
+            Iterator[EmbeddingBatch]: The chunks, their normalized vectors and their payload fields as metadata.
+        """
+        last = -1
+        while True:
+            with self.lock:
+                points = self.connection.execute("SELECT row, payload FROM points WHERE deleted = 0 AND row > ? "
+                                                 "ORDER BY row LIMIT ?", (last, batchSize)).fetchall()
+                if not points:
+                    return
+                rows = [row for row, _ in points]
+                vectors = np.array(self.vectors[rows])
+            last = rows[-1]
+            yield EmbeddingBatch.fromPayloads([json.loads(payload) for _, payload in points], vectors)
+
+    def close(self):
+        """
+        Flushes the vectors and closes the side store.
+        """
+        with self.lock:
+            self.vectors.flush()
+            self.connection.close()
+
+
+class LocalVectorDB(iVectorDB):
+    """
+    An embedded vector database storing each collection in a directory on the local disk, for single node deployments
+    and local benchmarks that should not depend on a QDrant instance.  Small collections are searched by brute force
+    with a vectorized cosine similarity, collections larger than indexThreshold are searched through an IVF index.
+    """
+    def __init__(self, directory: str, indexThreshold: int=200000, probes: int=8):
+        """
+        Constructor for the database.
+
+        Args:
+            directory (str): The directory the collections are stored in.  It is created if it does not exist.
+            indexThreshold (int): The amount of points at which a collection is indexed before it is searched.
+            probes (int): The amount of index clusters searched per query.  Higher values are slower but more accurate.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.indexThreshold = indexThreshold
+        self.probes = probes
+        self.collections = dict()
+        self._lock = threading.Lock()
+
+    def _getCollection(self, collectionName: str) -> LocalCollection:
+        """
+        Opens a collection, reusing it if it is already open.
+
+        Args:
+            collectionName (str): The identifier of the collection.
+
+        Returns:
+            LocalCollection: The collection.
+
+        Raises:
+            KeyError: If the collection does not exist.
+        """
+        with self._lock:
+            if collectionName not in self.collections:
+                directory = os.path.join(self.directory, collectionName)
+                try:
+                    with open(os.path.join(directory, "collection.json"), "r", encoding="utf8") as file:
+                        config = json.load(file)
+                except FileNotFoundError:
+                    raise KeyError(f"Collection {collectionName} does not exist")
+                self.collections[collectionName] = LocalCollection(directory, config["size"])
+            return self.collections[collectionName]
+
+    def createCollection(self, collectionName: str, size: int=None, profile: CollectionProfile=None):
+        """
+        Create a collection in the database.  Nothing is changed if the collection already exists.
+
+        Args:
+            collectionName (str): The identifier for the new collection.
+            size (int): The size of the embedding vectors that will be stored in the database.  Defaults to the
+                dimensions of the profile.
+            profile (CollectionProfile): How the vectors are sized.  Only the dimensions are used, vectors are always
+                stored in full precision and searched through the IVF index.
+        """
+        profile, size = CollectionProfile.resolve(collectionName, size, profile)
+        directory = os.path.join(self.directory, collectionName)
+        os.makedirs(directory, exist_ok=True)
+        configPath = os.path.join(directory, "collection.json")
+        if not os.path.exists(configPath):
+            with open(configPath, "w", encoding="utf8") as file:
+                json.dump({"size": size}, file)
+
+    def getCatalog(self, refresh: bool=False) -> dict[str, int]:
+        """
+        Retrieves the collections in the database and the size of the vectors they hold.
+
+        Args:
+            refresh (bool): Unused, the catalog is read from the directory every time.
+
+        Returns:
+            dict[str, int]: The collection identifiers mapped to the size of their vectors.
+        """
+        catalog = dict()
+        for name in os.listdir(self.directory):
+            configPath = os.path.join(self.directory, name, "collection.json")
+            if os.path.exists(configPath):
+                with open(configPath, "r", encoding="utf8") as file:
+                    catalog[name] = json.load(file)["size"]
+        return catalog
+
+    def saveToDB(self, batch: EmbeddingBatch, collectionName: str):
+        """
+        Save a collection of text-embedding combinations to a collection in the database.
+
+        Args:
+            batch (EmbeddingBatch): The chunks, their embedding vectors and their metadata.
+            collectionName (str): The identifier of the collection to save the points to.
+        """
+        if len(batch) == 0:
+            return
+        collection = self._getCollection(collectionName)
+        if batch.dimensions != collection.size:
+            raise ValueError(f"Collection {collectionName} holds vectors of size {collection.size}, "
+                             f"not {batch.dimensions}")
+        collection.upsert(batch)
+        self._notifyWrite(collectionName)
+
+    def getDocumentHashes(self, collectionName: str, source: str) -> set[str]:
+        """
+        Retrieves the manifest of a document, the content hashes of every chunk stored for it.
+
+        Args:
+            collectionName (str): The identifier of the collection to search.
+            source (str): The source document, matching the source metadata the chunks were saved with.
+
+        Returns:
+            set[str]: The content hashes of the chunks of the document.
+        """
+        collection = self._getCollection(collectionName)
+        with collection.lock:
+            return {contentHash for (contentHash,) in collection.connection.execute(
+                "SELECT chunkHash FROM points WHERE source = ? AND deleted = 0", (source,))}
+
+    def iterateCollection(self, collectionName: str, batchSize: int=1024) -> Iterator[EmbeddingBatch]:
+        """
+        Reads every point of a collection in batches, used to export collections.
+
+        Args:
+            collectionName (str): The identifier of the collection to read.
+            batchSize (int): The amount of points per batch.
+
+        Returns:
+            Iterator[EmbeddingBatch]: The chunks, their normalized vectors and their payload fields as metadata.
+        """
+        return self._getCollection(collectionName).iterate(batchSize)
+
+    def deleteDocumentChunks(self, collectionName: str, source: str, contentHashes: set[str]):
+        """
+        Deletes chunks of a document from a collection.
+
+        Args:
+            collectionName (str): The identifier of the collection to delete from.
+            source (str): The source document of the chunks.
+            contentHashes (set[str]): The content hashes of the chunks to delete.
+        """
+        self._getCollection(collectionName).delete([pointId(source, contentHash) for contentHash in contentHashes])
+        self._notifyWrite(collectionName)
+
+    def buildIndex(self, collectionName: str, numLists: int=None):
+        """
+        Builds the IVF index of a collection ahead of the first query, see LocalCollection.buildIndex.
+
+        Args:
+            collectionName (str): The identifier of the collection to index.
+            numLists (int): The amount of index clusters.  Defaults to the square root of the amount of points.
+        """
+        self._getCollection(collectionName).buildIndex(numLists)
+
+    def queryDB(self, embedding: list[float], collectionNames: list[str]=None, maxHits: int=100,
+                minSimilarity: float=0, sparseQuery: SparseVector=None,
+                filter: dict[str, Any]=None, withVectors: bool=False) -> list[ScoredPoint]:
+        """
+        Queries the database for similar vectors to the provided embedding vector.
+
+        Args:
+            embedding (list[float]): The embedding vector to use for semantic searching in the database.
+            collectionNames (list[str]): A list of collection identifiers to search with the provided embedding.
+                Defaults to every collection.  Collections holding vectors of a different size are skipped.
+            maxHits (int): The max amount of results to be returned by the query.
+            minSimilarity (float): The required minimum similarity to be returned by the query.  It only applies to the
+                embedding search, keyword scores are not similarities.
+            sparseQuery (SparseVector): The keywords of the query, see SparseEncoder.encodeQuery.  If given, every
+                collection is also searched by keyword and both rankings are fused with reciprocal rank fusion.
+            filter (dict[str, Any]): Only returns chunks whose payload matches the filter, see database.filters.
+            withVectors (bool): If True, the results hold their normalized embedding vector.
+
+        Returns:
+            list[ScoredPoint]: The first maxHits amount of results that meet the minSimilarity threshold to the
+            embedding query, merged across the collections and sorted by score.  Results of hybrid searches hold
+            their fused score instead of their similarity.  Every result holds its collection under the "collection"
+            payload field.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        catalog = self.getCatalog()
+
+        results = []
+        for name in (collectionNames or catalog):
+            if catalog.get(name) != len(query):
+                continue
+            collection = self._getCollection(name)
+            if collection.centroids is None and collection.count >= self.indexThreshold:
+                collection.buildIndex()
+            points = collection.search(query, maxHits, minSimilarity, self.probes, filter, withVectors)
+            if sparseQuery is not None and len(sparseQuery):
+                keywordPoints = collection.keywordSearch(sparseQuery, maxHits, filter, withVectors)
+                points = reciprocalRankFusion([points, keywordPoints], maxHits)
+            results.append(tagCollection(points, name))
+
+        return heapq.nlargest(maxHits, (point for points in results for point in points), key=lambda point: point.score)
+
+    def close(self):
+        """
+        Closes every open collection.
+        """
+        with self._lock:
+            for collection in self.collections.values():
+                collection.close()
+            self.collections = dict()
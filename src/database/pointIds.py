@@ -0,0 +1,50 @@
+from ..embed.embeddingBatch import EmbeddingBatch
+import hashlib
+import uuid
+
+# Namespace of the UUIDs generated for points, changing it would change the ID of every stored point
+POINT_NAMESPACE = uuid.UUID("6f0a4c55-1d2b-4f6e-9c3a-5b8e2d7f1a90")
+
+
+def chunkHash(text: str) -> str:
+    """
+    Hashes the content of a chunk.
+
+    Args:
+        text (str): The text of the chunk.
+
+    Returns:
+        str: The hex SHA-256 digest of the text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pointId(source: str, contentHash: str) -> str:
+    """
+    Derives the stable ID of a point from the document it came from and the hash of its content, so re-ingesting an
+    unchanged chunk of a document produces the same point instead of a new one.
+
+    Args:
+        source (str): The source document of the chunk, such as the URL it was crawled from.
+        contentHash (str): The hash of the chunk, see chunkHash.
+
+    Returns:
+        str: A UUID usable as a point ID.
+    """
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{source}\0{contentHash}"))
+
+
+def batchIds(batch: EmbeddingBatch) -> tuple[list[str], list[str]]:
+    """
+    Derives the point IDs and content hashes of every chunk in a batch.  Chunks without a source metadata value are
+    identified by their content alone.
+
+    Args:
+        batch (EmbeddingBatch): The batch to identify.
+
+    Returns:
+        tuple[list[str], list[str]]: The point ID and the content hash of each chunk.
+    """
+    sources = batch.metadata.get("source", [None] * len(batch))
+    hashes = [chunkHash(text) for text in batch.texts]
+    return [pointId(source or "", contentHash) for source, contentHash in zip(sources, hashes)], hashes
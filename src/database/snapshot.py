@@ -0,0 +1,205 @@
+"""
+A snapshot is a directory holding a single collection in a format independent of the database it came from::
+
+    manifest.json       The collection name, vector size, amount of points and vector type
+    vectors.bin         The vectors as one contiguous row-major block of float32, or int8 if quantized
+    scales.f32          The float32 scale of each int8 row, only present if quantized
+    payloads.jsonl.gz   The payload of each point as one JSON line, in the same order as the vectors
+
+Every file is written and read in batches, so collections larger than memory can be moved.
+"""
+from .DBInterface import iVectorDB
+from .collectionProfile import CollectionProfile
+from ..embed.embeddingBatch import EmbeddingBatch
+from ..embed.sparseEncoder import SparseEncoder
+from time import perf_counter
+from typing import Iterator
+import argparse
+import gzip
+import json
+import numpy as np
+import os
+
+SNAPSHOT_VERSION = 1
+
+
+def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Quantizes vectors to int8 with a symmetric scale per vector, keeping the relative error of every component within
+    half a step of 1/127 of the largest component.
+
+    Args:
+        vectors (np.ndarray): The float32 vectors to quantize.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The int8 vectors and the float32 scale of each vector.
+    """
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def exportCollection(db: iVectorDB, collectionName: str, directory: str, quantize: bool=False,
+                     batchSize: int=4096) -> dict[str, float]:
+    """
+    Exports a collection to a snapshot directory.
+
+    Args:
+        db (iVectorDB): The database holding the collection.
+        collectionName (str): The identifier of the collection to export.
+        directory (str): The directory to write the snapshot to.  It is created if it does not exist.
+        quantize (bool): If True, the vectors are stored as int8 with a scale per vector, taking a quarter of the
+            space at a small loss of precision.
+        batchSize (int): The amount of points read and written at once.
+
+    Returns:
+        dict[str, float]: The amount of points exported, the size of the snapshot in bytes and the elapsed seconds.
+
+    Raises:
+        KeyError: If the collection does not exist.
+    """
+    catalog = db.getCatalog()
+    if collectionName not in catalog:
+        # A collection created since the catalog was cached would otherwise be reported missing
+        catalog = db.getCatalog(refresh=True)
+    if collectionName not in catalog:
+        raise KeyError(f"Collection {collectionName} does not exist")
+
+    start = perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    scalesPath = os.path.join(directory, "scales.f32")
+    if not quantize and os.path.exists(scalesPath):
+        # Left by an earlier quantized export to the same directory
+        os.remove(scalesPath)
+    count = 0
+    with open(os.path.join(directory, "vectors.bin"), "wb") as vectorFile, \
+            gzip.open(os.path.join(directory, "payloads.jsonl.gz"), "wt", encoding="utf8") as payloadFile, \
+            open(scalesPath if quantize else os.devnull, "wb") as scaleFile:
+        for batch in db.iterateCollection(collectionName, batchSize):
+            if quantize:
+                vectors, scales = _quantize(batch.vectors)
+                scales.tofile(scaleFile)
+            else:
+                vectors = batch.vectors
+            vectors.tofile(vectorFile)
+            payloadFile.writelines(json.dumps(payload) + "\n" for payload in batch.payloads())
+            count += len(batch)
+
+    manifest = {"version": SNAPSHOT_VERSION, "collection": collectionName, "dimensions": catalog[collectionName],
+                "count": count, "vectorType": "int8" if quantize else "float32"}
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf8") as file:
+        json.dump(manifest, file, indent=2)
+
+    names = ["manifest.json", "vectors.bin", "payloads.jsonl.gz"] + (["scales.f32"] if quantize else [])
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+    return {"points": count, "bytes": size, "seconds": perf_counter() - start}
+
+
+def readManifest(directory: str) -> dict:
+    """
+    Reads the manifest of a snapshot.
+
+    Args:
+        directory (str): The directory of the snapshot.
+
+    Returns:
+        dict: The collection name, vector size, amount of points and vector type of the snapshot.
+
+    Raises:
+        ValueError: If the snapshot was written by an unsupported version.
+    """
+    with open(os.path.join(directory, "manifest.json"), "r", encoding="utf8") as file:
+        manifest = json.load(file)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')}, expected {SNAPSHOT_VERSION}")
+    return manifest
+
+
+def readSnapshot(directory: str, batchSize: int=4096) -> Iterator[EmbeddingBatch]:
+    """
+    Reads the points of a snapshot in batches.
+
+    Args:
+        directory (str): The directory of the snapshot.
+        batchSize (int): The amount of points per batch.
+
+    Returns:
+        Iterator[EmbeddingBatch]: The chunks, their float32 vectors and their payload fields as metadata.
+    """
+    manifest = readManifest(directory)
+    dimensions = manifest["dimensions"]
+    quantized = manifest["vectorType"] == "int8"
+    vectorType = np.int8 if quantized else np.float32
+
+    with open(os.path.join(directory, "vectors.bin"), "rb") as vectorFile, \
+            gzip.open(os.path.join(directory, "payloads.jsonl.gz"), "rt", encoding="utf8") as payloadFile, \
+            open(os.path.join(directory, "scales.f32") if quantized else os.devnull, "rb") as scaleFile:
+        for start in range(0, manifest["count"], batchSize):
+            amount = min(batchSize, manifest["count"] - start)
+            vectors = np.fromfile(vectorFile, dtype=vectorType, count=amount * dimensions).reshape(amount, dimensions)
+            if quantized:
+                vectors = vectors * np.fromfile(scaleFile, dtype=np.float32, count=amount)[:, None]
+            payloads = [json.loads(payloadFile.readline()) for _ in range(amount)]
+            yield EmbeddingBatch.fromPayloads(payloads, vectors)
+
+
+def importCollection(db: iVectorDB, directory: str, collectionName: str=None, profile: CollectionProfile=None,
+                     batchSize: int=4096, sparseEncoder: SparseEncoder=None) -> dict[str, float]:
+    """
+    Imports a snapshot into a collection through the batched saving of the database.  Point IDs are derived from the
+    source and content of the chunks, so importing a snapshot twice does not duplicate its points.
+
+    Args:
+        db (iVectorDB): The database to import into.
+        directory (str): The directory of the snapshot.
+        collectionName (str): The identifier of the collection to import into.  Defaults to the name of the exported
+            collection.  It is created if it does not exist.
+        profile (CollectionProfile): The profile of the created collection.  Its dimensions must match the snapshot.
+        batchSize (int): The amount of points read and saved at once.
+        sparseEncoder (SparseEncoder): If given, the keyword vectors of the chunks are recreated from their text for
+            hybrid search.
+
+    Returns:
+        dict[str, float]: The amount of points imported and the elapsed seconds.
+    """
+    manifest = readManifest(directory)
+    collectionName = collectionName if collectionName else manifest["collection"]
+    db.createCollection(collectionName, manifest["dimensions"], profile)
+
+    start = perf_counter()
+    count = 0
+    for batch in readSnapshot(directory, batchSize):
+        if sparseEncoder:
+            batch.sparse = sparseEncoder.encodeDocuments(batch.texts)
+        db.saveToDB(batch, collectionName)
+        count += len(batch)
+    return {"points": count, "seconds": perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports and imports collection snapshots")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("collection", help="The collection to export, or to import into")
+    parser.add_argument("directory", help="The snapshot directory")
+    parser.add_argument("--qdrant", help="The address of a QDrant instance")
+    parser.add_argument("--local", help="The directory of a LocalVectorDB")
+    parser.add_argument("--quantize", action="store_true", help="Store the exported vectors as int8")
+    arguments = parser.parse_args()
+
+    if arguments.qdrant:
+        from .QDrantDB import QDrantVectorDB
+        db = QDrantVectorDB(arguments.qdrant)
+    elif arguments.local:
+        from .localDB import LocalVectorDB
+        db = LocalVectorDB(arguments.local)
+    else:
+        parser.error("Either --qdrant or --local is required")
+
+    if arguments.action == "export":
+        print(exportCollection(db, arguments.collection, arguments.directory, arguments.quantize))
+    else:
+        print(importCollection(db, arguments.directory, arguments.collection, sparseEncoder=SparseEncoder()))
+
+
+if __name__ == "__main__":
+    main()
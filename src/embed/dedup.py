@@ -0,0 +1,146 @@
+import numpy as np
+import re
+import threading
+import zlib
+
+
+class MinHashDeduplicator:
+    """
+    Detects near-duplicate chunks with MinHash signatures and locality sensitive hashing.  Each chunk is reduced to a
+    fixed size signature of its word shingles, and signatures are indexed by bands so only chunks sharing a band are
+    compared.  A single instance remembers every chunk it has kept, so boilerplate repeated across the pages of an
+    ingest run is only embedded the first time it is seen.
+    """
+    # A Mersenne prime larger than any reduced shingle hash, keeping the permutations within 64 bit arithmetic
+    PRIME = (1 << 31) - 1
+    WORD_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, threshold: float=0.8, numPermutations: int=64, bands: int=16, shingleSize: int=3,
+                 seed: int=1):
+        """
+        Constructor for the deduplicator.
+
+        Args:
+            threshold (float): The estimated Jaccard similarity of the shingles at which a chunk counts as a duplicate.
+            numPermutations (int): The length of the MinHash signatures.
+            bands (int): The amount of bands the signatures are split into for indexing.  Must divide numPermutations.
+                More bands find more candidate pairs at lower similarities.
+            shingleSize (int): The amount of consecutive words in a shingle.
+            seed (int): The seed used to generate the hash permutations.
+        """
+        if numPermutations % bands:
+            raise ValueError(f"{bands} bands do not divide {numPermutations} permutations")
+
+        generator = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = numPermutations // bands
+        self.shingleSize = shingleSize
+        self._a = generator.integers(1, MinHashDeduplicator.PRIME, numPermutations, dtype=np.uint64)
+        self._b = generator.integers(0, MinHashDeduplicator.PRIME, numPermutations, dtype=np.uint64)
+        self._signatures = np.empty((1024, numPermutations), dtype=np.uint32)
+        self._count = 0
+        self._index = [dict() for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Calculates the MinHash signature of a text.
+
+        Args:
+            text (str): The text to sign.
+
+        Returns:
+            np.ndarray: The signature as a vector of numPermutations uint32 values.
+        """
+        words = MinHashDeduplicator.WORD_PATTERN.findall(text.lower())
+        shingles = {" ".join(words[index:index + self.shingleSize])
+                    for index in range(max(1, len(words) - self.shingleSize + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64,
+                             count=len(shingles)) % MinHashDeduplicator.PRIME
+        permuted = (np.outer(hashes, self._a) + self._b) % MinHashDeduplicator.PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _add(self, signature: np.ndarray, bandKeys: list[bytes]):
+        """
+        Adds a signature to the index.  Must be called with the lock held.
+
+        Args:
+            signature (np.ndarray): The signature to add.
+            bandKeys (list[bytes]): The index keys of each band of the signature.
+        """
+        if self._count == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[self._count] = signature
+
+        for band, key in zip(self._index, bandKeys):
+            band.setdefault(key, []).append(self._count)
+        self._count += 1
+
+    def _bandKeys(self, signature: np.ndarray) -> list[bytes]:
+        """
+        Splits a signature into the index keys of its bands.
+
+        Args:
+            signature (np.ndarray): The signature to split.
+
+        Returns:
+            list[bytes]: The index key of each band.
+        """
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, text: str):
+        """
+        Keeps a text without checking it, so later near-duplicates of it are dropped.  Used for chunks that are
+        already stored and must be kept regardless.
+
+        Args:
+            text (str): The text to keep.
+        """
+        signature = self.signature(text)
+        bandKeys = self._bandKeys(signature)
+        with self._lock:
+            self._add(signature, bandKeys)
+
+    def isDuplicate(self, text: str) -> bool:
+        """
+        Checks whether a text is a near-duplicate of a previously kept text, keeping it if it is not.
+
+        Args:
+            text (str): The text to check.
+
+        Returns:
+            bool: True if the text is a near-duplicate and should be dropped.
+        """
+        signature = self.signature(text)
+        bandKeys = self._bandKeys(signature)
+
+        with self._lock:
+            self.checked += 1
+            candidates = set()
+            for band, key in zip(self._index, bandKeys):
+                candidates.update(band.get(key, ()))
+
+            if candidates:
+                # Verify the candidates, sharing a band does not guarantee the similarity threshold is met
+                similarity = (self._signatures[list(candidates)] == signature).mean(axis=1)
+                if similarity.max() >= self.threshold:
+                    self.duplicates += 1
+                    return True
+
+            self._add(signature, bandKeys)
+            return False
+
+    def filter(self, chunks: list[str]) -> list[str]:
+        """
+        Removes the near-duplicates from a list of chunks.
+
+        Args:
+            chunks (list[str]): The chunks to filter.
+
+        Returns:
+            list[str]: The chunks that are not near-duplicates of earlier chunks, in their original order.
+        """
+        return [chunk for chunk in chunks if not self.isDuplicate(chunk)]
@@ -0,0 +1,173 @@
+from array import array
+from typing import Optional
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed cache of embedding vectors stored in a SQLite database on disk.  Entries are keyed
+    by the embedding model and a hash of the normalized chunk text, so unchanged chunks from a re-crawled source do not
+    need to be sent to the embedding API again.  The cache is bounded by a maximum entry count and evicts the least
+    recently used entries once that bound is exceeded.
+    """
+    def __init__(self, path: str, maxEntries: int=500000):
+        """
+        Opens (or creates) the cache database.
+
+        Args:
+            path (str): The path of the SQLite file to store the cache in.  Missing parent directories are created.
+            maxEntries (int): The maximum amount of vectors to keep before the least recently used are evicted.
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings ("
+                                     "key TEXT PRIMARY KEY, "
+                                     "vector BLOB NOT NULL, "
+                                     "lastUsed REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS embeddingsLastUsed ON embeddings (lastUsed)")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalizes a chunk of text so that chunks differing only in whitespace share a cache entry.
+
+        Args:
+            text (str): The chunk of text to normalize.
+
+        Returns:
+            str: The text with all runs of whitespace collapsed to a single space.
+        """
+        return " ".join(text.split())
+
+    @staticmethod
+    def makeKey(model: str, text: str) -> str:
+        """
+        Creates the content address of a chunk for a given model.
+
+        Args:
+            model (str): The identifier of the embedding model.
+            text (str): The chunk of text being embedded.
+
+        Returns:
+            str: A hex digest identifying the model and normalized text combination.
+        """
+        return hashlib.sha256(f"{model}\0{EmbeddingCache.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def getMany(self, model: str, texts: list[str]) -> dict[str, list[float]]:
+        """
+        Looks up the cached vectors for a list of chunks, updating the hit and miss counters.
+
+        Args:
+            model (str): The identifier of the embedding model.
+            texts (list[str]): The chunks to look up.
+
+        Returns:
+            dict[str, list[float]]: The chunks found in the cache mapped to their embedding vectors.  Chunks that were
+            not found are omitted.
+        """
+        keys = {EmbeddingCache.makeKey(model, text): text for text in texts}
+        found = dict()
+
+        with self._lock:
+            keyList = list(keys)
+            # SQLite limits the amount of bound parameters per statement
+            for start in range(0, len(keyList), 500):
+                batch = keyList[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[keys[key]] = array("f", vector).tolist()
+
+            if found:
+                now = time.time()
+                hitKeys = [key for key, text in keys.items() if text in found]
+                with self._connection:
+                    self._connection.executemany("UPDATE embeddings SET lastUsed = ? WHERE key = ?",
+                                                 [(now, key) for key in hitKeys])
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def get(self, model: str, text: str) -> Optional[list[float]]:
+        """
+        Looks up the cached vector of a single chunk.
+
+        Args:
+            model (str): The identifier of the embedding model.
+            text (str): The chunk to look up.
+
+        Returns:
+            list[float]: The cached embedding vector, or None if the chunk is not cached.
+        """
+        return self.getMany(model, [text]).get(text)
+
+    def putMany(self, model: str, vectors: dict[str, list[float]]):
+        """
+        Stores embedding vectors in the cache, evicting the least recently used entries if the cache is full.
+
+        Args:
+            model (str): The identifier of the embedding model that created the vectors.
+            vectors (dict[str, list[float]]): Chunks mapped to their embedding vectors.
+        """
+        now = time.time()
+        rows = [(EmbeddingCache.makeKey(model, text), array("f", vector).tobytes(), now)
+                for text, vector in vectors.items()]
+
+        with self._lock:
+            with self._connection:
+                self._connection.executemany("INSERT OR REPLACE INTO embeddings (key, vector, lastUsed) "
+                                             "VALUES (?, ?, ?)", rows)
+            self._evict()
+
+    def put(self, model: str, text: str, vector: list[float]):
+        """
+        Stores a single embedding vector in the cache.
+
+        Args:
+            model (str): The identifier of the embedding model that created the vector.
+            text (str): The chunk that was embedded.
+            vector (list[float]): The embedding vector of the chunk.
+        """
+        self.putMany(model, {text: vector})
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache is within maxEntries.  Must be called with the lock held.
+        """
+        count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.maxEntries:
+            with self._connection:
+                self._connection.execute("DELETE FROM embeddings WHERE key IN "
+                                         "(SELECT key FROM embeddings ORDER BY lastUsed ASC LIMIT ?)",
+                                         (count - self.maxEntries,))
+
+    @property
+    def hitRate(self) -> float:
+        """
+        float: The fraction of lookups that were served from the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        """
+        Closes the connection to the cache database.
+        """
+        with self._lock:
+            self._connection.close()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from .embeddingBatch import EmbeddingBatch
 
 class iEmbed(ABC):
     """
@@ -7,17 +8,43 @@ class iEmbed(ABC):
     """
     @abstractmethod
     def createEmbedding(content: str, maxChunkSize: int, chunkOverlap: int,
-                        delimiter: list[str]) -> dict[str, list[float]]:
+                        delimiter: list[str]) -> EmbeddingBatch:
         """
         Takes in a string, chunks the string and embeds the chunks.
 
         Args:
             content (str): The string to be embedded.
-            maxChunkSize (int): The max size chunks should be.
-            chunkOverlap (int): The overlap between chunks.
+            maxChunkSize (int): The max size chunks should be, in tokens.
+            chunkOverlap (int): The overlap between chunks, in tokens.
             delimiter (list[str]): A list of delimiters that the splitter should chunk on.
 
         Returns:
-            dict[str, list[float]]: a dictionary of all split chunks as keys and corresponding embeddings as values.
+            EmbeddingBatch: The unique chunks of the string and their embedding vectors.
+        """
+        pass
+
+    @abstractmethod
+    async def embedChunks(self, chunks: list[str]) -> EmbeddingBatch:
+        """
+        Embeds chunks that have already been split, without chunking them again.
+
+        Args:
+            chunks (list[str]): The chunks of text to embed.
+
+        Returns:
+            EmbeddingBatch: The chunks and their embedding vectors, in the same order as the chunks.
+        """
+        pass
+
+    @abstractmethod
+    async def embedQuery(self, query: str) -> list[float]:
+        """
+        Embeds a search query as a single vector without chunking it.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            list[float]: The embedding vector representing the query.
         """
         pass
@@ -35,6 +35,59 @@ class EmbedPrepper:
         chunks = text_splitter.split_text(content)
         return chunks
 
+    @staticmethod
+    def getEncoding(model: str) -> tiktoken.Encoding:
+        """
+        Retrieves the tokenizer used by a model, falling back to cl100k_base for models tiktoken does not know.
+
+        Args:
+            model (str): The identifier of the model whose tokenizer should be retrieved.
+
+        Returns:
+            tiktoken.Encoding: The tokenizer for the model.
+        """
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+
+    @staticmethod
+    def packBatches(chunks: list[str], encoding: tiktoken.Encoding, maxBatchTokens: int=100000,
+                    maxBatchItems: int=512) -> tuple[list[list[str]], list[int]]:
+        """
+        Packs chunks into batches for multi-input embedding requests, keeping each batch within a token and item budget.
+        The order of the chunks is preserved across the batches.
+
+        Args:
+            chunks (list[str]): The chunks to pack into batches.
+            encoding (tiktoken.Encoding): The tokenizer used to measure the size of each chunk.
+            maxBatchTokens (int): The maximum amount of tokens in a single batch.  A chunk larger than this budget is
+                placed in a batch on its own.
+            maxBatchItems (int): The maximum amount of chunks in a single batch.
+
+        Returns:
+            tuple[list[list[str]], list[int]]: The chunks split into consecutive batches, and the amount of tokens of
+            each batch so the batches do not have to be measured again.
+        """
+        batches = []
+        counts = []
+        batch = []
+        batchTokens = 0
+
+        for chunk, tokens in zip(chunks, encoding.encode_ordinary_batch(chunks)):
+            if batch and (batchTokens + len(tokens) > maxBatchTokens or len(batch) >= maxBatchItems):
+                batches.append(batch)
+                counts.append(batchTokens)
+                batch = []
+                batchTokens = 0
+            batch.append(chunk)
+            batchTokens += len(tokens)
+
+        if batch:
+            batches.append(batch)
+            counts.append(batchTokens)
+        return batches, counts
+
     @staticmethod
     def removeExtraWhitespace(content: str) -> str:
         """
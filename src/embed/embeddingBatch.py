@@ -0,0 +1,134 @@
+from .sparseEncoder import SparseVector
+from typing import Any
+import numpy as np
+
+
+class EmbeddingBatch:
+    """
+    A compact, column oriented collection of embedded chunks.  The vectors are stored as one contiguous float32 matrix
+    instead of a Python list of floats per chunk, and any metadata is stored as one list per field.  Embedding models
+    return batches and databases save them directly.
+    """
+    def __init__(self, texts: list[str], vectors: np.ndarray, metadata: dict[str, list[Any]]=None,
+                 sparse: list[SparseVector]=None):
+        """
+        Constructor for the batch.
+
+        Args:
+            texts (list[str]): The embedded chunks.
+            vectors (np.ndarray): A matrix with the embedding vector of each chunk as a row, converted to float32.
+            metadata (dict[str, list[Any]]): Metadata fields mapped to a list holding the value of each chunk.
+            sparse (list[SparseVector]): The keyword vector of each chunk, see SparseEncoder.  Databases index them for
+                hybrid search when given.
+        """
+        self.texts = list(texts)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.vectors.ndim != 2:
+            self.vectors = self.vectors.reshape(len(self.texts), -1) if self.texts else self.vectors.reshape(0, 0)
+        self.metadata = dict(metadata) if metadata else dict()
+        self.sparse = list(sparse) if sparse is not None else None
+
+        if self.vectors.shape[0] != len(self.texts):
+            raise ValueError(f"{self.vectors.shape[0]} vectors were given for {len(self.texts)} chunks")
+
+        if self.sparse is not None and len(self.sparse) != len(self.texts):
+            raise ValueError(f"{len(self.sparse)} sparse vectors were given for {len(self.texts)} chunks")
+
+        for name, values in self.metadata.items():
+            if len(values) != len(self.texts):
+                raise ValueError(f"Metadata field {name} has {len(values)} values for {len(self.texts)} chunks")
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def dimensions(self) -> int:
+        """
+        int: The size of the embedding vectors in the batch.
+        """
+        return self.vectors.shape[1]
+
+    def payloads(self) -> list[dict[str, Any]]:
+        """
+        Creates the payload stored with each vector in a database.
+
+        Returns:
+            list[dict[str, Any]]: The text and metadata of each chunk.
+        """
+        columns = list(self.metadata.items())
+        return [{"text": text, **{name: values[index] for name, values in columns}}
+                for index, text in enumerate(self.texts)]
+
+    @staticmethod
+    def fromPayloads(payloads: list[dict[str, Any]], vectors: np.ndarray) -> "EmbeddingBatch":
+        """
+        Creates a batch from the payloads stored in a database, the inverse of payloads.  Fields missing from some
+        payloads are filled with None.
+
+        Args:
+            payloads (list[dict[str, Any]]): The payload of each chunk, holding its text and metadata.
+            vectors (np.ndarray): A matrix with the embedding vector of each chunk as a row.
+
+        Returns:
+            EmbeddingBatch: The chunks, their vectors and their metadata.
+        """
+        names = dict.fromkeys(name for payload in payloads for name in payload if name != "text")
+        return EmbeddingBatch([payload.get("text", "") for payload in payloads], vectors,
+                              {name: [payload.get(name) for payload in payloads] for name in names})
+
+    def slice(self, start: int, stop: int) -> "EmbeddingBatch":
+        """
+        Creates a batch holding a range of the chunks.  The vectors are a view of this batch and are not copied.
+
+        Args:
+            start (int): The index of the first chunk to include.
+            stop (int): The index after the last chunk to include.
+
+        Returns:
+            EmbeddingBatch: The chunks in the range.
+        """
+        return EmbeddingBatch(self.texts[start:stop], self.vectors[start:stop],
+                              {name: values[start:stop] for name, values in self.metadata.items()},
+                              self.sparse[start:stop] if self.sparse is not None else None)
+
+    def select(self, indices: list[int]) -> "EmbeddingBatch":
+        """
+        Creates a batch holding the chunks at the given indices.
+
+        Args:
+            indices (list[int]): The indices of the chunks to include, in the order they should appear.
+
+        Returns:
+            EmbeddingBatch: The selected chunks.
+        """
+        return EmbeddingBatch([self.texts[index] for index in indices], self.vectors[indices],
+                              {name: [values[index] for index in indices] for name, values in self.metadata.items()},
+                              [self.sparse[index] for index in indices] if self.sparse is not None else None)
+
+    @staticmethod
+    def concat(batches: list["EmbeddingBatch"]) -> "EmbeddingBatch":
+        """
+        Joins several batches into one.  Metadata fields missing from some batches are filled with None, and sparse
+        vectors missing from some batches are filled with empty vectors.
+
+        Args:
+            batches (list[EmbeddingBatch]): The batches to join, all holding vectors of the same size.
+
+        Returns:
+            EmbeddingBatch: A batch holding the chunks of every batch in order.
+        """
+        if len(batches) == 1:
+            return batches[0]
+
+        names = dict.fromkeys(name for batch in batches for name in batch.metadata)
+        sparse = None
+        if any(batch.sparse is not None for batch in batches):
+            empty = SparseVector(np.empty(0), np.empty(0))
+            sparse = [vector for batch in batches
+                      for vector in (batch.sparse if batch.sparse is not None else [empty] * len(batch))]
+        return EmbeddingBatch([text for batch in batches for text in batch.texts],
+                              np.concatenate([batch.vectors for batch in batches]),
+                              {name: [value for batch in batches
+                                      for value in batch.metadata.get(name, [None] * len(batch))]
+                               for name in names},
+                              sparse)
@@ -0,0 +1,125 @@
+from .embedInterface import iEmbed
+from .embeddingBatch import EmbeddingBatch
+from .tokenChunker import TokenChunker
+import numpy as np
+import re
+import zlib
+
+
+class HashEmbed(iEmbed):
+    """
+    An offline, deterministic embedding model using feature hashing.  Words and word bigrams are hashed into a fixed
+    amount of signed buckets and the resulting vectors are L2 normalized, so cosine similarity measures lexical overlap.
+    No network calls are made, which allows ingestion and retrieval to be benchmarked without the OpenAI API.
+
+    Notes:
+        The chunker measures chunks with tiktoken, which downloads its tokenizer files on first use.  In air-gapped
+        environments the files can be copied ahead of time into the directory set by the TIKTOKEN_CACHE_DIR environment
+        variable.
+    """
+    WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+    def __init__(self, dimensions: int=1536, bigrams: bool=True):
+        """
+        Constructor for HashEmbed
+
+        Args:
+            dimensions (int): The size of the embedding vectors, matching the size of the collections they are stored in.
+            bigrams (bool): If True, adjacent word pairs are hashed in addition to single words.
+        """
+        self.dimensions = dimensions
+        self.bigrams = bigrams
+
+    def _features(self, text: str) -> list[str]:
+        """
+        Extracts the features of a text that are hashed into the vector.
+
+        Args:
+            text (str): The text to extract features from.
+
+        Returns:
+            list[str]: The words of the text, followed by the word bigrams if enabled.
+        """
+        words = HashEmbed.WORD_PATTERN.findall(text.lower())
+        if self.bigrams:
+            words += [f"{first} {second}" for first, second in zip(words, words[1:])]
+        return words
+
+    def embedMatrix(self, chunks: list[str]) -> np.ndarray:
+        """
+        Embeds a list of chunks into a matrix of vectors.
+
+        Args:
+            chunks (list[str]): The chunks of text to embed.
+
+        Returns:
+            np.ndarray: A float32 matrix with one L2 normalized row per chunk.
+        """
+        rows = []
+        hashes = []
+        for row, chunk in enumerate(chunks):
+            features = [zlib.crc32(feature.encode("utf-8")) for feature in self._features(chunk)]
+            rows.extend([row] * len(features))
+            hashes.extend(features)
+
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        # The bucket comes from the low bits of the hash and the sign from the highest bit
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        matrix = np.zeros((len(chunks), self.dimensions), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.int64), (hashes % self.dimensions).astype(np.int64)), signs)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    async def embedChunks(self, chunks: list[str]) -> EmbeddingBatch:
+        """
+        Creates the embedding vectors of several chunks.
+
+        Args:
+            chunks (list[str]): The chunks of text to embed.
+
+        Returns:
+            EmbeddingBatch: The chunks and their embedding vectors, in the same order as the chunks.
+        """
+        return EmbeddingBatch(chunks, self.embedMatrix(chunks))
+
+    async def embedQuery(self, query: str) -> list[float]:
+        """
+        Embeds a search query as a single vector without chunking it.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            list[float]: The embedding vector representing the query.
+        """
+        return self.embedMatrix([query])[0].tolist()
+
+    async def createEmbedding(self, content: str, maxChunkSize: int=200, chunkOverlap: int=25,
+                              delimiter: list[str]=["\n", ". ", " "]) -> EmbeddingBatch:
+        """
+        Creates a collection of embeddings by chunking the provided content and embedding each of those chunks
+
+        Args:
+            content (str): The string to be embedded.
+            maxChunkSize (int): The max size chunks should be, in tokens.
+            chunkOverlap (int): The overlap between chunks, in tokens.
+            delimiter (list): A list of delimiters that the splitter should chunk on.
+
+        Returns:
+            EmbeddingBatch: The unique chunks of the content and their embedding vectors.
+        """
+        chunks = list(dict.fromkeys(TokenChunker(maxChunkSize, chunkOverlap, delimiter).chunk(content)))
+        return await self.embedChunks(chunks)
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    embed = HashEmbed()
+    chunks = [f"CVE-2024-{index} remote code execution vulnerability in component {index % 97} " * 8
+              for index in range(10000)]
+    start = perf_counter()
+    embed.embedMatrix(chunks)
+    print(f"{len(chunks) / (perf_counter() - start):.0f} chunks per second")
@@ -1,24 +1,63 @@
 import os
 
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
 from .embedInterface import iEmbed
 from .embedPrepper import EmbedPrepper
+from .embedCache import EmbeddingCache
+from .embeddingBatch import EmbeddingBatch
+from .rateLimiter import RateLimitScheduler
+from .tokenChunker import TokenChunker
+from collections import OrderedDict
 import asyncio
+import numpy as np
 import sys
+import threading
 
 class OpenAIEmbed(iEmbed):
     """
     Implementation of OpenAI's embedding model
     """
-    def __init__(self, model: str):
+    # Errors worth retrying, anything else (authentication, bad requests) fails immediately
+    RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+    def __init__(self, model: str, cache: EmbeddingCache=None, maxBatchTokens: int=100000, maxBatchItems: int=512,
+                 scheduler: RateLimitScheduler=None, baseUrl: str=None, queryCacheSize: int=1024,
+                 client: AsyncOpenAI=None, dimensions: int=None):
         """
         Constructor for openAIEmbed
         Args:
             model (str): The identifier for the model to be used. Model identifiers can be found
                 at https://platform.openai.com/docs/models/embeddings
+            cache (EmbeddingCache): An optional persistent cache consulted before chunks are sent to the API.  Chunks
+                found in the cache are not embedded again.
+            maxBatchTokens (int): The maximum amount of tokens sent in a single embedding request.
+            maxBatchItems (int): The maximum amount of chunks sent in a single embedding request.  OpenAI accepts at
+                most 2048 inputs per request.
+            scheduler (RateLimitScheduler): The scheduler every request is sent through.  Defaults to the scheduler
+                shared by the whole process so separate instances do not exceed the account limits together.
+            baseUrl (str): An alternative API endpoint, such as a local fake server used for testing.
+            queryCacheSize (int): The amount of query vectors kept in memory by embedQuery.
+            client (AsyncOpenAI): An existing client to reuse, keeping its pooled connections.  It should be created
+                with max_retries=0, as retries are handled by the scheduler.  baseUrl is ignored if a client is given.
+            dimensions (int): Shortens the embedding vectors to this size, supported by text-embedding-3 models.  It
+                should match the dimensions of the CollectionProfile of the collections the vectors are saved to.
+                Defaults to the native size of the model.
         """
-        self.client = AsyncOpenAI()
+        # Retries are handled by the scheduler so the client itself should not retry
+        self.client = client if client else AsyncOpenAI(base_url=baseUrl, max_retries=0)
+        self.scheduler = scheduler if scheduler else RateLimitScheduler.shared()
         self.model = model
+        self.dimensions = dimensions
+        # Vectors of different sizes must not share cache entries
+        self.cacheModel = f"{model}/{dimensions}" if dimensions else model
+        self._options = {"dimensions": dimensions} if dimensions else dict()
+        self.cache = cache
+        self.maxBatchTokens = maxBatchTokens
+        self.maxBatchItems = maxBatchItems
+        self.encoding = EmbedPrepper.getEncoding(model)
+        self.queryCacheSize = queryCacheSize
+        self.queryCache = OrderedDict()
+        self._queryCacheLock = threading.Lock()
 
     async def embedChunk(self, content: str) -> list[float]:
         """
@@ -30,41 +69,111 @@ class OpenAIEmbed(iEmbed):
         Returns:
             list[float]: An embedding vector representing the content
         """
-        response = await self.client.embeddings.create(
-            input=content,
-            model=self.model
+        response = await self.scheduler.submit(
+            lambda: self.client.embeddings.create(input=content, model=self.model, **self._options),
+            tokens=len(self.encoding.encode_ordinary(content)),
+            retryOn=OpenAIEmbed.RETRYABLE_ERRORS
         )
         return response.data[0].embedding
 
-    async def createEmbedding(self, content: str, maxChunkSize: int=800, chunkOverlap: int=100,
-                              delimiter: str=["\n\n", "\n", " ", ""]) -> dict[str, list[float]]:
+    async def embedBatch(self, chunks: list[str], tokens: int=None) -> list[list[float]]:
+        """
+        Creates the embedding vectors of several chunks with a single multi-input request.
+
+        Args:
+            chunks (list[str]): The chunks of text to embed.  The caller is responsible for keeping the chunks within
+                the request limits of the API, see EmbedPrepper.packBatches.
+            tokens (int): The amount of tokens of the chunks, if they were already measured.
+
+        Returns:
+            list[list[float]]: The embedding vectors in the same order as the chunks.
+        """
+        if tokens is None:
+            tokens = sum(len(chunkTokens) for chunkTokens in self.encoding.encode_ordinary_batch(chunks))
+        response = await self.scheduler.submit(
+            lambda: self.client.embeddings.create(input=chunks, model=self.model, **self._options),
+            tokens=tokens,
+            retryOn=OpenAIEmbed.RETRYABLE_ERRORS
+        )
+        return [data.embedding for data in sorted(response.data, key=lambda data: data.index)]
+
+    async def embedChunks(self, chunks: list[str]) -> EmbeddingBatch:
+        """
+        Embeds chunks that have already been split.  Chunks found in the cache are not sent to the API, and the
+        remaining chunks are packed into as few multi-input requests as the batch budgets allow.
+
+        Args:
+            chunks (list[str]): The chunks of text to embed.
+
+        Returns:
+            EmbeddingBatch: The chunks and their embedding vectors, in the same order as the chunks.
+        """
+        # The cache is read and written on a worker thread so SQLite does not block the event loop
+        embeddings = await asyncio.to_thread(self.cache.getMany, self.cacheModel, chunks) if self.cache else dict()
+        missing = list(dict.fromkeys(chunk for chunk in chunks if chunk not in embeddings))
+
+        batches, counts = EmbedPrepper.packBatches(missing, self.encoding, self.maxBatchTokens, self.maxBatchItems)
+        batchEmbeddings = await asyncio.gather(*[self.embedBatch(batch, tokens)
+                                                 for batch, tokens in zip(batches, counts)])
+
+        created = dict()
+        for batch, vectors in zip(batches, batchEmbeddings):
+            created.update(zip(batch, vectors))
+
+        if self.cache and created:
+            await asyncio.to_thread(self.cache.putMany, self.cacheModel, created)
+
+        embeddings.update(created)
+        return EmbeddingBatch(chunks, np.array([embeddings[chunk] for chunk in chunks], dtype=np.float32))
+
+    async def embedQuery(self, query: str) -> list[float]:
+        """
+        Embeds a search query as a single vector without chunking it.  Recently embedded queries are served from an
+        in-memory least recently used cache without calling the API.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            list[float]: The embedding vector representing the query.
+        """
+        key = EmbeddingCache.normalize(query)
+        with self._queryCacheLock:
+            if key in self.queryCache:
+                self.queryCache.move_to_end(key)
+                return self.queryCache[key]
+
+        embedding = await self.embedChunk(query)
+
+        with self._queryCacheLock:
+            self.queryCache[key] = embedding
+            self.queryCache.move_to_end(key)
+            while len(self.queryCache) > self.queryCacheSize:
+                self.queryCache.popitem(last=False)
+        return embedding
+
+    async def createEmbedding(self, content: str, maxChunkSize: int=200, chunkOverlap: int=25,
+                              delimiter: list[str]=["\n", ". ", " "]) -> EmbeddingBatch:
         """
         Creates a collection of embeddings by chunking the provided content and embedding each of those chunks
 
         Args:
             content (str): The string to be embedded.
-            maxChunkSize (int): The max size chunks should be.
-            chunkOverlap (int): The overlap between chunks.
+            maxChunkSize (int): The max size chunks should be, in tokens.
+            chunkOverlap (int): The overlap between chunks, in tokens.
             delimiter (list): A list of delimiters that the splitter should chunk on.
 
         Returns:
-            dict[str, list[float]]: a dictionary of all split chunks as keys and corresponding embeddings as values.
+            EmbeddingBatch: The unique chunks of the content and their embedding vectors.
 
         TODO:
             Improve the method by which text is chunked.  I believe this will be the biggest impact on results of the
             application.
         """
-        content = EmbedPrepper.removeExtraWhitespace(content)
-        chunks = EmbedPrepper.chunkTextBySize(content, maxChunkSize, chunkOverlap, delimiter)
-        embeddingMap = dict()
-
-        for chunk in chunks:
-            # print(chunk)
-            embeddingMap[chunk] = asyncio.ensure_future(self.embedChunk(chunk))
-
-        await asyncio.gather(*list(embeddingMap.values()))
-
-        return embeddingMap
+        chunks = list(TokenChunker(maxChunkSize, chunkOverlap, delimiter, self.encoding).chunk(content))
+        # Duplicate chunks only need to be embedded once
+        chunks = list(dict.fromkeys(chunks))
+        return await self.embedChunks(chunks)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+import asyncio
+import random
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket used to keep a rate, such as requests or tokens per minute, under a limit.  Reservations
+    are granted immediately and put the bucket into debt, the caller is told how long to wait before the debt is repaid.
+    This keeps callers in first come, first served order without a background refill task.
+    """
+    def __init__(self, perMinute: float):
+        """
+        Creates a full bucket.
+
+        Args:
+            perMinute (float): The amount of units the bucket refills per minute.  This is also the bucket capacity.
+        """
+        self.capacity = float(perMinute)
+        self.refillPerSecond = perMinute / 60
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Reserves units from the bucket.
+
+        Args:
+            amount (float): The amount of units to take.  Amounts larger than the capacity are clamped to the capacity
+                so oversized requests can still proceed.
+
+        Returns:
+            float: The amount of seconds the caller has to wait before using the reserved units.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.refillPerSecond)
+            self._updated = now
+            self._level -= min(amount, self.capacity)
+            return max(0.0, -self._level / self.refillPerSecond)
+
+
+class RateLimitScheduler:
+    """
+    Schedules calls to a rate limited API.  Calls are admitted by a requests per minute and a tokens per minute bucket,
+    the amount of calls in flight at once is capped, and failed calls are retried with jittered exponential backoff.
+
+    Notes:
+        The scheduler holds no event loop bound state, so a single instance can be shared between threads and event
+        loops.  Use RateLimitScheduler.shared() to get the instance shared by every caller in the process.
+    """
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self, requestsPerMinute: int=3000, tokensPerMinute: int=1000000, maxInFlight: int=16,
+                 maxRetries: int=6, baseDelay: float=0.5, maxDelay: float=30.0):
+        """
+        Constructor for the scheduler.
+
+        Args:
+            requestsPerMinute (int): The maximum amount of requests to start per minute.
+            tokensPerMinute (int): The maximum amount of tokens to send per minute.
+            maxInFlight (int): The maximum amount of requests waiting on a response at once.
+            maxRetries (int): The amount of times a failed request is retried before the error is raised.
+            baseDelay (float): The delay in seconds of the first retry, doubled on every following retry.
+            maxDelay (float): The upper bound of the delay in seconds between retries.
+        """
+        self.requestBucket = TokenBucket(requestsPerMinute)
+        self.tokenBucket = TokenBucket(tokensPerMinute)
+        self.maxRetries = maxRetries
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retries = 0
+        # Free request slots, and the futures of the callers waiting for one in arrival order with their event loop
+        self._freeSlots = maxInFlight
+        self._waiters = deque()
+        self._slotLock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "RateLimitScheduler":
+        """
+        Retrieves the scheduler shared by every caller in the process, creating it with the default limits if needed.
+
+        Returns:
+            RateLimitScheduler: The process wide scheduler.
+        """
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def setShared(cls, scheduler: "RateLimitScheduler"):
+        """
+        Replaces the scheduler shared by every caller in the process, used to configure limits for an account.
+
+        Args:
+            scheduler (RateLimitScheduler): The scheduler to share.
+        """
+        with cls._sharedLock:
+            cls._shared = scheduler
+
+    async def _acquireSlot(self):
+        """
+        Waits until a request slot is free.  Waiting callers are queued in arrival order, each on a future of its own
+        event loop, and a released slot is handed to the first of them, so the slots are shared fairly across event
+        loops without polling.
+        """
+        loop = asyncio.get_running_loop()
+        with self._slotLock:
+            if self._freeSlots and not self._waiters:
+                self._freeSlots -= 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._slotLock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                    granted = False
+                except ValueError:
+                    granted = True
+            # A slot handed over while the caller was cancelled is passed on
+            if granted:
+                self._releaseSlot()
+            raise
+
+    @staticmethod
+    def _grant(waiter: asyncio.Future):
+        """
+        Wakes a caller waiting for a slot, run on the event loop of the caller.
+
+        Args:
+            waiter (asyncio.Future): The future the caller is waiting on.
+        """
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _releaseSlot(self):
+        """
+        Frees a request slot, handing it to the first waiting caller if there is one.
+        """
+        with self._slotLock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(RateLimitScheduler._grant, waiter)
+                    return
+                except RuntimeError:
+                    # The event loop of the caller has been closed
+                    continue
+            self._freeSlots += 1
+
+    def _retryDelay(self, attempt: int, error: Exception) -> float:
+        """
+        Calculates how long to wait before retrying a failed request.
+
+        Args:
+            attempt (int): The amount of attempts made so far.
+            error (Exception): The error raised by the failed attempt.  A retry-after header on its response is honoured.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        delay = random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** attempt))
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            delay = max(delay, float(headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+        return delay
+
+    async def submit(self, request: Callable[[], Awaitable[T]], tokens: int=0,
+                     retryOn: tuple[type[Exception], ...]=(Exception,)) -> T:
+        """
+        Runs a request once the rate limits allow it, retrying it if it fails.
+
+        Args:
+            request (Callable[[], Awaitable[T]]): A function creating the awaitable request.  It is called again for
+                every retry.
+            tokens (int): The amount of tokens the request consumes.
+            retryOn (tuple[type[Exception], ...]): The errors that should cause the request to be retried.
+
+        Returns:
+            T: The result of the request.
+        """
+        attempt = 0
+        while True:
+            await asyncio.sleep(max(self.requestBucket.reserve(1), self.tokenBucket.reserve(tokens)))
+            await self._acquireSlot()
+            try:
+                return await request()
+            except retryOn as error:
+                if attempt >= self.maxRetries:
+                    raise error
+                delay = self._retryDelay(attempt, error)
+            finally:
+                self._releaseSlot()
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,133 @@
+from collections import Counter
+import numpy as np
+import re
+import zlib
+
+
+class SparseVector:
+    """
+    A sparse vector holding only its non-zero dimensions, used for keyword search next to the dense embedding vectors.
+    """
+    def __init__(self, indices: np.ndarray, values: np.ndarray):
+        """
+        Constructor for the vector.
+
+        Args:
+            indices (np.ndarray): The non-zero dimensions, converted to uint32.
+            values (np.ndarray): The value of each non-zero dimension, converted to float32.
+        """
+        self.indices = np.asarray(indices, dtype=np.uint32)
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __repr__(self) -> str:
+        return f"SparseVector({len(self)} terms)"
+
+
+class SparseEncoder:
+    """
+    Encodes texts as BM25 term weight vectors.  Terms are hashed into 32 bit indices, so no vocabulary has to be built
+    or shared between ingestion and querying.  Document vectors hold the saturated and length normalized term
+    frequencies of BM25, while the inverse document frequencies are applied by the database at query time since they
+    depend on the whole collection.
+
+    Identifiers such as CVE-2024-29943 or 124.0.1 are kept as single terms, and their parts are added as terms of their
+    own so partial identifiers still match.
+    """
+    TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.:][a-z0-9]+)*")
+    PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, k1: float=1.2, b: float=0.75, averageLength: float=150):
+        """
+        Constructor for the encoder.
+
+        Args:
+            k1 (float): How quickly repeated terms stop adding to the weight of a term.
+            b (float): How strongly the weights of long chunks are reduced, from 0 for not at all to 1.
+            averageLength (float): The expected amount of terms in a chunk, used to normalize the weights by length.
+                It does not need to be exact, chunks are already limited in size by the chunker.
+        """
+        self.k1 = k1
+        self.b = b
+        self.averageLength = averageLength
+
+    @staticmethod
+    def terms(text: str) -> list[str]:
+        """
+        Splits a text into the terms that are indexed.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            list[str]: The terms of the text, with the parts of compound identifiers following them.
+        """
+        terms = []
+        for term in SparseEncoder.TERM_PATTERN.findall(text.lower()):
+            terms.append(term)
+            parts = SparseEncoder.PART_PATTERN.findall(term)
+            if len(parts) > 1:
+                terms.extend(parts)
+        return terms
+
+    @staticmethod
+    def termIndex(term: str) -> int:
+        """
+        Hashes a term to its index in the sparse vectors.
+
+        Args:
+            term (str): The term to hash.
+
+        Returns:
+            int: The index of the term.
+        """
+        return zlib.crc32(term.encode("utf-8"))
+
+    def encodeDocument(self, text: str) -> SparseVector:
+        """
+        Encodes a chunk for indexing.
+
+        Args:
+            text (str): The chunk to encode.
+
+        Returns:
+            SparseVector: The BM25 weight of every term of the chunk, without the inverse document frequency.
+        """
+        terms = SparseEncoder.terms(text)
+        weights = Counter()
+        for term, count in Counter(terms).items():
+            # Different terms can share an index, their weights are then combined
+            weights[SparseEncoder.termIndex(term)] += count
+
+        frequencies = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        norm = self.k1 * (1 - self.b + self.b * len(terms) / self.averageLength)
+        return SparseVector(np.fromiter(weights.keys(), dtype=np.uint32, count=len(weights)),
+                            frequencies * (self.k1 + 1) / (frequencies + norm))
+
+    def encodeDocuments(self, texts: list[str]) -> list[SparseVector]:
+        """
+        Encodes several chunks for indexing.
+
+        Args:
+            texts (list[str]): The chunks to encode.
+
+        Returns:
+            list[SparseVector]: The vector of each chunk, in the same order.
+        """
+        return [self.encodeDocument(text) for text in texts]
+
+    def encodeQuery(self, query: str) -> SparseVector:
+        """
+        Encodes a search query.  Every distinct term of the query has a weight of 1, so the score of a chunk is the sum
+        of the BM25 weights of the query terms it contains.
+
+        Args:
+            query (str): The query to encode.
+
+        Returns:
+            SparseVector: The terms of the query.
+        """
+        indices = sorted({SparseEncoder.termIndex(term) for term in SparseEncoder.terms(query)})
+        return SparseVector(np.asarray(indices, dtype=np.uint32), np.ones(len(indices), dtype=np.float32))
@@ -0,0 +1,178 @@
+from collections import deque
+from typing import Iterable, Iterator, Union
+from time import perf_counter
+import random
+import tiktoken
+
+
+class TokenChunker:
+    """
+    A streaming chunker that normalizes whitespace and splits text into chunks in a single linear pass.  Chunk sizes are
+    measured in tokens of the embedding model instead of characters, and the input can be a string or an iterable of
+    string pieces, such as a file read in blocks, so very large documents never have to be held in memory at once.
+    """
+    # Characters that the previous implementation treated as line breaks
+    LINE_BREAKS = str.maketrans({"\xa0": "\n", "\r": "\n"})
+
+    def __init__(self, maxTokens: int=200, overlapTokens: int=25, delimiters: Union[list[str], str]=["\n", ". ", " "],
+                 encoding: tiktoken.Encoding=None):
+        """
+        Constructor for the chunker.
+
+        Args:
+            maxTokens (int): The maximum amount of tokens in a chunk.
+            overlapTokens (int): The amount of tokens from the end of a chunk to repeat at the start of the next chunk.
+            delimiters (list[str]): Delimiters used, in order, to split lines that are larger than maxTokens.  Pieces
+                that are still too large after every delimiter is tried are split on token boundaries.
+            encoding (tiktoken.Encoding): The tokenizer used to measure chunks.  Defaults to cl100k_base, the tokenizer
+                of OpenAI's current embedding models.
+        """
+        self.maxTokens = maxTokens
+        self.overlapTokens = overlapTokens
+        self.delimiters = [delimiters] if isinstance(delimiters, str) else list(delimiters)
+        self.encoding = encoding if encoding else tiktoken.get_encoding("cl100k_base")
+
+    @staticmethod
+    def normalizeWhitespace(content: Union[str, Iterable[str]]) -> Iterator[str]:
+        """
+        Normalizes line breaks the same way as EmbedPrepper.removeExtraWhitespace, but in a single pass and without
+        rebuilding the whole string.
+
+        Args:
+            content (Union[str, Iterable[str]]): The text, or pieces of the text, to normalize.
+
+        Returns:
+            Iterator[str]: The non-blank lines of the text, in order and without their line breaks.
+        """
+        if isinstance(content, str):
+            content = [content]
+
+        pending = []
+        for piece in content:
+            lines = piece.translate(TokenChunker.LINE_BREAKS).split("\n")
+            pending.append(lines[0])
+            for line in lines[1:]:
+                text = "".join(pending)
+                if text.strip():
+                    yield text
+                pending = [line]
+
+        text = "".join(pending)
+        if text.strip():
+            yield text
+
+    def _split(self, text: str, tokenCount: int, delimiterIndex: int) -> Iterator[tuple[str, int]]:
+        """
+        Splits a piece of text into units no larger than maxTokens.
+
+        Args:
+            text (str): The text to split.
+            tokenCount (int): The amount of tokens in the text.
+            delimiterIndex (int): The index of the first delimiter that has not been tried on the text yet.
+
+        Returns:
+            Iterator[tuple[str, int]]: The units of the text and their token counts.
+        """
+        if tokenCount <= self.maxTokens:
+            yield text, tokenCount
+            return
+
+        if delimiterIndex >= len(self.delimiters):
+            tokens = self.encoding.encode_ordinary(text)
+            for start in range(0, len(tokens), self.maxTokens):
+                window = tokens[start:start + self.maxTokens]
+                yield self.encoding.decode(window), len(window)
+            return
+
+        delimiter = self.delimiters[delimiterIndex]
+        parts = text.split(delimiter)
+        # Keep the delimiter attached so joining the units recreates the original text
+        pieces = [part + delimiter for part in parts[:-1]] + [parts[-1]]
+        for piece in pieces:
+            if piece:
+                yield from self._split(piece, len(self.encoding.encode_ordinary(piece)), delimiterIndex + 1)
+
+    def _units(self, content: Union[str, Iterable[str]]) -> Iterator[tuple[str, int]]:
+        """
+        Produces the smallest units that chunks are built from, normally whole lines.
+
+        Args:
+            content (Union[str, Iterable[str]]): The text, or pieces of the text, to split.
+
+        Returns:
+            Iterator[tuple[str, int]]: The units of the text and their token counts.
+        """
+        for line in TokenChunker.normalizeWhitespace(content):
+            line += "\n"
+            yield from self._split(line, len(self.encoding.encode_ordinary(line)), 0)
+
+    def chunk(self, content: Union[str, Iterable[str]]) -> Iterator[str]:
+        """
+        Splits text into chunks of at most maxTokens tokens, with consecutive chunks overlapping by up to
+        overlapTokens tokens.
+
+        Args:
+            content (Union[str, Iterable[str]]): The text, or pieces of the text, to chunk.
+
+        Returns:
+            Iterator[str]: The chunks of the text, produced as the input is consumed.
+        """
+        window = deque()
+        windowTokens = 0
+
+        for text, tokenCount in self._units(content):
+            if window and windowTokens + tokenCount > self.maxTokens:
+                chunk = "".join(unit for unit, _ in window).strip()
+                if chunk:
+                    yield chunk
+                # Keep the tail of the chunk as the overlap of the next one
+                while window and (windowTokens > self.overlapTokens or windowTokens + tokenCount > self.maxTokens):
+                    windowTokens -= window.popleft()[1]
+
+            window.append((text, tokenCount))
+            windowTokens += tokenCount
+
+        if window:
+            chunk = "".join(unit for unit, _ in window).strip()
+            if chunk:
+                yield chunk
+
+
+def benchmarkChunkers(megabytes: int=4, seed: int=0):
+    """
+    Micro-benchmark comparing EmbedPrepper against TokenChunker on a synthetic multi-megabyte document.
+
+    Args:
+        megabytes (int): The approximate size of the generated document.
+        seed (int): The seed of the random document generator.
+    """
+    from .embedPrepper import EmbedPrepper
+
+    generator = random.Random(seed)
+    words = ["vulnerability", "CVE-2024-29943", "exploit", "the", "a", "remote", "attacker", "could", "memory",
+             "corruption", "Firefox", "patch", "advisory", "severity", "critical", "execute", "code", "via"]
+    lines = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        line = " ".join(generator.choice(words) for _ in range(generator.randint(5, 40)))
+        line += generator.choice(["\n", "\n\n\n", "\r\n", "\xa0\n", ". "])
+        lines.append(line)
+        size += len(line)
+    document = "".join(lines)
+
+    start = perf_counter()
+    chunks = EmbedPrepper.chunkTextBySize(EmbedPrepper.removeExtraWhitespace(document), 800, 100)
+    print(f"EmbedPrepper: {len(chunks)} chunks in {perf_counter() - start:.2f}s")
+
+    start = perf_counter()
+    chunks = sum(1 for _ in TokenChunker(200, 25).chunk(document))
+    print(f"TokenChunker: {chunks} chunks in {perf_counter() - start:.2f}s")
+
+    start = perf_counter()
+    blocks = (document[index:index + 65536] for index in range(0, len(document), 65536))
+    chunks = sum(1 for _ in TokenChunker(200, 25).chunk(blocks))
+    print(f"TokenChunker (streamed in 64KiB blocks): {chunks} chunks in {perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    benchmarkChunkers()
@@ -0,0 +1,156 @@
+from src.database.QDrantDB import QDrantVectorDB
+from src.database.collectionProfile import CollectionProfile, PROFILES
+from src.embed.embedInterface import iEmbed
+from src.embed.openAIEmbed import OpenAIEmbed
+from src.embed.hashEmbed import HashEmbed
+from src.embed.sparseEncoder import SparseEncoder
+from src.model.semanticCache import SemanticCache
+from src.model.conversationMemory import ConversationStore
+from src.model.contextAssembler import ContextAssembler
+from src.model.completionCache import CompletionCache
+from src.model.retrievalOrchestrator import RetrievalOrchestrator
+from src.model.mmrReranker import MMRReranker
+from openai import AsyncOpenAI, OpenAI
+from os import environ
+from typing import Any, Coroutine, TypeVar
+import asyncio
+import atexit
+import httpx
+import threading
+import traceback
+
+T = TypeVar("T")
+
+
+class AppResources:
+    """
+    Holds the long lived clients of the web app so they are created once per worker process instead of once per request.
+    Connections to QDrant and OpenAI are pooled and kept alive between requests.  Asynchronous work is run on a single
+    background event loop, since asynchronous clients cannot be shared between the event loops Flask creates for each
+    request.
+    """
+    def __init__(self, qdrantHost: str=None, embedModel: str="text-embedding-3-small", maxConnections: int=20,
+                 keepAliveSeconds: float=120, profile: CollectionProfile=None):
+        """
+        Creates the clients.  No connections are opened until warmUp is called or the clients are first used.
+
+        Args:
+            qdrantHost (str): The address of the QDrant instance.  Defaults to the CHATCSEC_QDRANT_HOST environment
+                variable, or the lab instance if it is not set.
+            embedModel (str): The identifier of the OpenAI embedding model.
+            maxConnections (int): The maximum amount of pooled connections per OpenAI client.
+            keepAliveSeconds (float): How long idle pooled connections are kept open.
+            profile (CollectionProfile): The profile of the searched collections, setting the size of the query
+                vectors.  Defaults to the profile named by the CHATCSEC_PROFILE environment variable, or "full".
+        """
+        limits = httpx.Limits(max_connections=maxConnections, max_keepalive_connections=maxConnections,
+                              keepalive_expiry=keepAliveSeconds)
+        timeout = httpx.Timeout(60.0, connect=5.0)
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="resources-event-loop", daemon=True)
+        self._thread.start()
+
+        self.db = QDrantVectorDB(qdrantHost if qdrantHost else environ.get("CHATCSEC_QDRANT_HOST", "129.21.21.11"))
+        self.openAIClient = OpenAI(api_key=environ["OPENAI_API_KEY"],
+                                   http_client=httpx.Client(limits=limits, timeout=timeout))
+        self.asyncOpenAIClient = AsyncOpenAI(max_retries=0,
+                                             http_client=httpx.AsyncClient(limits=limits, timeout=timeout))
+        self.profile = profile if profile else PROFILES[environ.get("CHATCSEC_PROFILE", "full")]
+        self.embed = AppResources.createEmbed(embedModel, self.asyncOpenAIClient, self.profile.dimensions)
+        self.sparseEncoder = SparseEncoder()
+        # Answers are dropped when this process writes to their collection
+        self.answerCache = SemanticCache()
+        self.db.addWriteListener(self.answerCache.invalidate)
+        self.conversations = ConversationStore()
+        # Identical completion requests, including HyDE drafts, are answered from memory or disk
+        self.completionCache = CompletionCache(environ.get("CHATCSEC_COMPLETION_CACHE", "./data/completions.sqlite"))
+        self.contextAssembler = ContextAssembler()
+        # Runs the direct and HyDE searches of a question concurrently on the background event loop, over-fetching
+        # results and keeping a diverse few of them for the prompt
+        self.retrieval = RetrievalOrchestrator(self.db, self.embed, self.contextAssembler, self.sparseEncoder,
+                                               maxHits=100, reranker=MMRReranker(), topN=12)
+        self.closed = False
+
+    @staticmethod
+    def createEmbed(model: str, client: AsyncOpenAI=None, dimensions: int=1536) -> iEmbed:
+        """
+        Creates the embedding model used by the web app.  Setting the environment variable CHATCSEC_EMBED_BACKEND to
+        "hash" selects the offline HashEmbed model, allowing the app to run without calling the OpenAI embedding API.
+
+        Args:
+            model (str): The identifier of the OpenAI embedding model.
+            client (AsyncOpenAI): The client the OpenAI embedding model should use.
+            dimensions (int): The size of the embedding vectors.
+
+        Returns:
+            iEmbed: The embedding model to use.
+        """
+        if environ.get("CHATCSEC_EMBED_BACKEND") == "hash":
+            return HashEmbed(dimensions)
+        return OpenAIEmbed(model, client=client, dimensions=dimensions)
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """
+        Runs a coroutine on the background event loop and waits for its result.
+
+        Args:
+            coroutine (Coroutine[Any, Any, T]): The coroutine to run.
+
+        Returns:
+            T: The result of the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def warmUp(self):
+        """
+        Opens the connections to QDrant and OpenAI ahead of the first request.  Failures are reported but do not stop
+        the app, the connections will be retried when the clients are first used.
+        """
+        try:
+            self.db.getCatalog(refresh=True)
+        except Exception:
+            traceback.print_exc()
+            print("Unable to warm up the QDrant connection")
+
+        try:
+            self.openAIClient.models.list()
+            self.run(self.asyncOpenAIClient.models.list())
+        except Exception:
+            traceback.print_exc()
+            print("Unable to warm up the OpenAI connections")
+
+    def close(self):
+        """
+        Closes every client and stops the background event loop.
+        """
+        if self.closed:
+            return
+        self.closed = True
+
+        self.run(self.asyncOpenAIClient.close())
+        self.openAIClient.close()
+        self.db.client.close()
+        self.completionCache.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+_resources = None
+_resourcesLock = threading.Lock()
+
+
+def getResources() -> AppResources:
+    """
+    Retrieves the resources of the current worker process, creating and warming them up on first use.
+
+    Returns:
+        AppResources: The shared resources.
+    """
+    global _resources
+    with _resourcesLock:
+        if _resources is None:
+            _resources = AppResources()
+            _resources.warmUp()
+            atexit.register(_resources.close)
+        return _resources
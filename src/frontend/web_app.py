@@ -1,45 +1,157 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
+import json
+import os
+import traceback
+import uuid
 #from database.DBInterface import iDB
-from src.database.QDrantDB import QDrantVectorDB
 #from embed.embedInterface import iEmbed0
-from src.embed.openAIEmbed import OpenAIEmbed
 #from model.modelInterface import iModel
 from src.model.GPT import GPT
-import sys
+from src.model.asyncGPT import AsyncGPT
+from src.frontend.resources import getResources
 
 app = Flask(__name__)
+# Signs the session cookie holding the conversation ID, sessions do not survive a restart unless the key is set
+app.secret_key = os.environ.get("CHATCSEC_SECRET_KEY") or os.urandom(32)
+
+
+def startTurn(resources, data: dict) -> dict:
+    """
+    Prepares answering a question of the current browser session, answering it from the cache if possible.
+
+    Args:
+        resources (AppResources): The shared clients of the web app.
+        data (dict): The JSON body of the request, holding the question and optional payload filter.
+
+    Returns:
+        dict: The model, session, question, filter, question embedding and cache key of the turn, whether it is the
+        first turn of the conversation, and the cached answer or None.
+    """
+    # Conversations are kept per browser session in the shared store
+    sessionId = session.setdefault('id', uuid.uuid4().hex)
+    # The asynchronous model runs on the background event loop alongside the embedding and search work
+    model = AsyncGPT("You are an advanced subject matter expert on the field of cybersecurity", "gpt-4-turbo-preview",
+                     client=resources.asyncOpenAIClient, conversations=resources.conversations,
+                     cache=resources.completionCache)
+    memory = model.conversations.get(sessionId, model.systemMessage, model.model)
+
+    #This is where the data comes in
+    prompt = data['user_input']
+    # Optional payload filter narrowing the search, such as {"cveYears": 2024}, see src.database.filters
+    queryFilter = data.get('filters')
+
+    # Repeated questions are answered from the cache, skipping the search and the completion.  Only the first
+    # question of a conversation is cached, follow up questions depend on the earlier turns.
+    promptEmbedding = resources.run(resources.embed.embedQuery(prompt))
+    cacheModel = f"{model.model}/{model_selection}/{json.dumps(queryFilter, sort_keys=True)}"
+    firstTurn = len(memory) == 0
+    cachedResponse = resources.answerCache.lookup(promptEmbedding, collection_selection, cacheModel, prompt) \
+        if firstTurn else None
+    if cachedResponse is not None:
+        memory.addTurn(prompt, cachedResponse)
+
+    return {"model": model, "sessionId": sessionId, "prompt": prompt, "filter": queryFilter,
+            "embedding": promptEmbedding, "cacheModel": cacheModel, "firstTurn": firstTurn, "cached": cachedResponse}
+
+
+def retrieveContext(resources, turn: dict) -> str:
+    """
+    Searches the selected collection for the question of a turn and assembles the context of its prompt.  In HyDE
+    mode the question and a hypothetical answer are searched concurrently and their results fused.
+
+    Args:
+        resources (AppResources): The shared clients of the web app.
+        turn (dict): The turn created by startTurn.
+
+    Returns:
+        str: The context of the prompt.
+    """
+    context, _ = resources.run(resources.retrieval.retrieve(turn["model"], turn["prompt"], [collection_selection],
+                                                            hyde=model_selection == 'HYDE', filter=turn["filter"],
+                                                            embedding=turn["embedding"]))
+    return context
+
+
+def finishTurn(resources, turn: dict, response: str):
+    """
+    Caches the answer to the first question of a conversation.
+
+    Args:
+        resources (AppResources): The shared clients of the web app.
+        turn (dict): The turn created by startTurn.
+        response (str): The complete answer of the model.
+    """
+    if turn["firstTurn"]:
+        resources.answerCache.store(turn["embedding"], collection_selection, turn["cacheModel"], turn["prompt"],
+                                    response)
+
+
+def serverSentEvent(data: dict) -> str:
+    """
+    Formats a server sent event.
+
+    Args:
+        data (dict): The data of the event, sent as JSON.
+
+    Returns:
+        str: The event.
+    """
+    return f"data: {json.dumps(data)}\n\n"
 
-@app.route('/', methods=['GET', 'POST'])
-async def home():
-    db = QDrantVectorDB("129.21.21.11")
-    embed = OpenAIEmbed("text-embedding-3-small")
-    model = GPT("You are an advanced subject matter expert on the field of cybersecurity", "gpt-4-turbo-preview")
 
+@app.route('/', methods=['GET', 'POST'])
+def home():
     if request.method == 'POST':
-        #This is where the data comes in
-        data = request.json
-        prompt = data['user_input']
-
-        if model_selection == 'HYDE':
-            hydeResponse = model.hydePrompt(prompt)
-            hydeEmbedding = list((await embed.createEmbedding(hydeResponse, maxChunkSize=sys.maxsize,
-                                                 chunkOverlap=0,
-                                                 delimiter="\n"*50)).values())[0]
-
-            hydeResults = db.queryDB(hydeEmbedding, collectionNames=[collection_selection], maxHits=50)
-            hydeResponse = model.prompt(hydeResults, prompt)
-            return jsonify({'response': hydeResponse})
-        else:
-            promptEmbedding = list((await embed.createEmbedding(prompt, maxChunkSize=sys.maxsize,
-                                                 chunkOverlap=0,
-                                                 delimiter="\n"*50)).values())[0]
-
-            promptResults = db.queryDB(promptEmbedding, collectionNames=[collection_selection], maxHits=50)
-            promptResponse = model.prompt(promptResults, prompt)
-            return jsonify({'response': promptResponse})
+        resources = getResources()
+        turn = startTurn(resources, request.json)
+        if turn["cached"] is not None:
+            return jsonify({'response': turn["cached"]})
+
+        context = retrieveContext(resources, turn)
+        response = resources.run(turn["model"].prompt(context, turn["prompt"], turn["sessionId"]))
+        finishTurn(resources, turn, response)
+        return jsonify({'response': response})
 
     return render_template('index.html')
 
+
+@app.route('/stream', methods=['POST'])
+def stream():
+    """
+    Answers a question like home, streaming the answer as server sent events while the model generates it.  Every
+    event holds a JSON object with either a "token" to append to the answer, an "error", or "done" once the answer is
+    complete.
+    """
+    resources = getResources()
+    turn = startTurn(resources, request.json)
+    # Tokens are forwarded from the request thread, which reads the stream of the synchronous client
+    streamModel = GPT(turn["model"].systemMessage, turn["model"].model, client=resources.openAIClient,
+                      conversations=resources.conversations, cache=resources.completionCache)
+
+    def events():
+        if turn["cached"] is not None:
+            yield serverSentEvent({'token': turn["cached"]})
+            yield serverSentEvent({'done': True})
+            return
+
+        try:
+            context = retrieveContext(resources, turn)
+            pieces = []
+            for token in streamModel.promptStream(context, turn["prompt"], turn["sessionId"]):
+                pieces.append(token)
+                yield serverSentEvent({'token': token})
+        except Exception as error:
+            traceback.print_exc()
+            yield serverSentEvent({'error': str(error)})
+            return
+
+        finishTurn(resources, turn, "".join(pieces))
+        yield serverSentEvent({'done': True})
+
+    # Proxies must not buffer the events, or the answer arrives all at once
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 model_selection = 'defualt'
 
 @app.route('/switch_model', methods=['POST'])
@@ -66,6 +178,8 @@ def about():
 
 
 def run():
+    # Create and warm up the shared clients before the first request arrives
+    getResources()
     app.run(debug=True)
 
 
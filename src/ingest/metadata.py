@@ -0,0 +1,38 @@
+from typing import Any
+import re
+
+# Metadata of a crawled document stored with every one of its chunks, see scraper.documentMetadata
+DOCUMENT_FIELDS = ("url", "domain", "contentType", "crawledAt")
+CVE_PATTERN = re.compile(r"\bCVE-(\d{4})-(\d{4,7})\b", re.IGNORECASE)
+
+
+def documentFields(metadata: dict[str, Any]) -> dict[str, Any]:
+    """
+    Selects the metadata of a document that is stored with its chunks.
+
+    Args:
+        metadata (dict[str, Any]): The metadata saved by the crawler.
+
+    Returns:
+        dict[str, Any]: The stored fields present in the metadata.
+    """
+    return {name: metadata[name] for name in DOCUMENT_FIELDS if name in metadata}
+
+
+def chunkFields(chunks: list[str]) -> dict[str, list[Any]]:
+    """
+    Extracts the CVE identifiers mentioned by each chunk, and the years they were assigned in.
+
+    Args:
+        chunks (list[str]): The chunks to search.
+
+    Returns:
+        dict[str, list[Any]]: The "cves" and "cveYears" metadata columns, holding a sorted list per chunk.
+    """
+    cves = []
+    cveYears = []
+    for chunk in chunks:
+        matches = CVE_PATTERN.findall(chunk)
+        cves.append(sorted({f"CVE-{year}-{number}" for year, number in matches}))
+        cveYears.append(sorted({int(year) for year, _ in matches}))
+    return {"cves": cves, "cveYears": cveYears}
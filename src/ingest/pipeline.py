@@ -0,0 +1,333 @@
+from ..database.DBInterface import iVectorDB
+from ..database.pointIds import chunkHash
+from ..embed.embedInterface import iEmbed
+from ..embed.embeddingBatch import EmbeddingBatch
+from ..embed.dedup import MinHashDeduplicator
+from ..embed.sparseEncoder import SparseEncoder
+from ..scraper.documentMetadata import isMetadataFile, readDocumentMetadata, removeDocumentMetadata
+from .metadata import chunkFields, documentFields
+from ..embed.tokenChunker import TokenChunker
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+from time import perf_counter
+import asyncio
+import os
+
+
+class _Document:
+    """
+    Tracks the groups of a document that are still on their way to the database.
+    """
+    def __init__(self, source: str, path: str):
+        """
+        Constructor for the tracker.
+
+        Args:
+            source (str): The identifier of the document in the database.
+            path (str): The path of the document.
+        """
+        self.source = source
+        self.path = path
+        # The amount of queued groups that have not been saved yet
+        self.pending = 0
+        # Whether every group of the document has been queued
+        self.chunked = False
+        # The content hashes of the previous version of the document to delete once the new chunks are saved
+        self.stale = set()
+
+
+class IngestPipeline:
+    """
+    A streaming ingestion pipeline that moves documents through chunking, embedding and saving stages connected by
+    bounded queues.  Each stage runs its own amount of workers and a full queue makes the previous stage wait, so
+    memory use stays constant regardless of the size of the corpus and vectors reach the database while the rest of
+    the corpus is still being processed.
+    """
+    # Marks the end of the work for a worker of the next stage
+    _DONE = object()
+
+    def __init__(self, db: iVectorDB, embed: iEmbed, collectionName: str, chunker: TokenChunker=None,
+                 chunkWorkers: int=2, embedWorkers: int=4, saveWorkers: int=1, queueSize: int=16,
+                 embedBatchSize: int=128, saveBatchSize: int=512, removeFiles: bool=False,
+                 deduplicator: MinHashDeduplicator=None, incremental: bool=True, sparseEncoder: SparseEncoder=None):
+        """
+        Constructor for the pipeline.
+
+        Args:
+            db (iVectorDB): The database the embeddings are saved to.
+            embed (iEmbed): The embedding model used to embed the chunks.
+            collectionName (str): The collection to save the embeddings under.
+            chunker (TokenChunker): The chunker used to split documents.  Defaults to a TokenChunker with its default
+                sizes.
+            chunkWorkers (int): The amount of documents chunked at once.
+            embedWorkers (int): The amount of embedding batches in flight at once.
+            saveWorkers (int): The amount of batches saved to the database at once.
+            queueSize (int): The maximum amount of items waiting between two stages.
+            embedBatchSize (int): The amount of chunks grouped into one call to the embedding model.
+            saveBatchSize (int): The amount of embeddings grouped into one save to the database.
+            removeFiles (bool): If True, documents read from files are deleted once their chunks have been saved.
+            deduplicator (MinHashDeduplicator): If given, chunks that are near-duplicates of a chunk seen earlier in
+                the run are dropped before they are embedded.
+            incremental (bool): If True, chunks already stored for a document are not embedded again and chunks that
+                are no longer part of the document are deleted, see iVectorDB.syncDocument.
+            sparseEncoder (SparseEncoder): If given, the keyword vector of every chunk is saved next to its embedding
+                so the collection can be searched with hybrid queries.
+        """
+        self.db = db
+        self.embed = embed
+        self.collectionName = collectionName
+        self.chunker = chunker if chunker else TokenChunker()
+        self.chunkWorkers = chunkWorkers
+        self.embedWorkers = embedWorkers
+        self.saveWorkers = saveWorkers
+        self.queueSize = queueSize
+        self.embedBatchSize = embedBatchSize
+        self.saveBatchSize = saveBatchSize
+        self.removeFiles = removeFiles
+        self.deduplicator = deduplicator
+        self.incremental = incremental
+        self.sparseEncoder = sparseEncoder
+        self.stats = dict()
+
+    @staticmethod
+    def fileSource(directory: str) -> Iterator[str]:
+        """
+        Lists the documents saved by the crawler.
+
+        Args:
+            directory (str): The directory to search, normally the text directory of the crawler output.
+
+        Returns:
+            Iterator[str]: The paths of the files in the directory and its subdirectories, without the metadata files
+            saved next to them.
+        """
+        for root, _, fileNames in os.walk(directory):
+            for fileName in fileNames:
+                if not isMetadataFile(fileName):
+                    yield os.path.join(root, fileName)
+
+    @staticmethod
+    def _readBlocks(path: str, blockSize: int=65536) -> Iterator[str]:
+        """
+        Reads a file in blocks so large documents are never held in memory at once.
+
+        Args:
+            path (str): The path of the file to read.
+            blockSize (int): The amount of characters per block.
+
+        Returns:
+            Iterator[str]: The contents of the file in blocks.
+        """
+        with open(path, "r", encoding="utf8") as file:
+            while block := file.read(blockSize):
+                yield block
+
+    def _nextChunks(self, chunks: Iterator[str], existing: set[str], kept: set[str]) -> tuple[list[str], int, int]:
+        """
+        Pulls the next group of chunks from a chunk generator, run in a thread so chunking does not block the event loop.
+
+        Args:
+            chunks (Iterator[str]): The chunk generator of a document.
+            existing (set[str]): The manifest of the document, chunks with these content hashes are not returned.
+            kept (set[str]): Collects the content hashes of the manifest that are still part of the document.
+
+        Returns:
+            tuple[list[str], int, int]: Up to embedBatchSize chunks, empty once the document is exhausted, and the
+            amount of chunks dropped as near-duplicates and skipped as unchanged along the way.  The counts are
+            returned instead of added to the statistics, which are only updated from the event loop.
+        """
+        group = []
+        duplicates = 0
+        unchanged = 0
+        for chunk in chunks:
+            contentHash = chunkHash(chunk)
+            if contentHash in existing:
+                # Stored chunks are kept before deduplication, dropping one would delete it as stale
+                kept.add(contentHash)
+                if self.deduplicator:
+                    self.deduplicator.add(chunk)
+                unchanged += 1
+                continue
+            if self.deduplicator and self.deduplicator.isDuplicate(chunk):
+                duplicates += 1
+                continue
+
+            group.append(chunk)
+            if len(group) >= self.embedBatchSize:
+                break
+        return group, duplicates, unchanged
+
+    async def _chunkDocument(self, path: str, output: asyncio.Queue):
+        """
+        Chunks a document and queues its chunks in groups for the embedding stage.  In incremental mode the chunks of
+        the previous version of the document that are missing from the new version are deleted once the new chunks
+        have been saved, and so are the files of the document if removeFiles is set.  Documents saved by the crawler
+        are identified by their URL, other files by their path.
+
+        Args:
+            path (str): The path of the document.
+            output (asyncio.Queue): The queue of the embedding stage.
+        """
+        metadata = await asyncio.to_thread(readDocumentMetadata, path)
+        document = _Document(metadata.get("url", path), path)
+        fields = documentFields(metadata)
+        existing = set()
+        if self.incremental:
+            existing = await asyncio.to_thread(self.db.getDocumentHashes, self.collectionName, document.source)
+
+        kept = set()
+        chunks = self.chunker.chunk(IngestPipeline._readBlocks(path))
+        while True:
+            group, duplicates, unchanged = await asyncio.to_thread(self._nextChunks, chunks, existing, kept)
+            self.stats["duplicates"] += duplicates
+            self.stats["unchanged"] += unchanged
+            if not group:
+                break
+            document.pending += 1
+            await output.put((document, fields, group))
+
+        document.stale = existing - kept
+        document.chunked = True
+        if not document.pending:
+            await self._finishDocument(document)
+
+    async def _finishDocument(self, document: "_Document"):
+        """
+        Deletes the stale chunks and, if removeFiles is set, the files of a document once all of its new chunks have
+        been saved, so a failed run never leaves a document with neither its old nor its new chunks, nor loses a file
+        whose chunks were not saved.
+
+        Args:
+            document (_Document): The document whose chunks have all been saved.
+        """
+        if document.stale:
+            await asyncio.to_thread(self.db.deleteDocumentChunks, self.collectionName, document.source,
+                                    document.stale)
+            self.stats["deleted"] += len(document.stale)
+
+        self.stats["documents"] += 1
+        if self.removeFiles:
+            os.remove(document.path)
+            removeDocumentMetadata(document.path)
+
+    async def _embedChunks(self, group: tuple["_Document", dict[str, Any], list[str]], output: asyncio.Queue):
+        """
+        Embeds a group of chunks and queues them for the saving stage.
+
+        Args:
+            group (tuple[_Document, dict[str, Any], list[str]]): The source document of the chunks, the metadata of
+                the document and the chunks to embed.
+            output (asyncio.Queue): The queue of the saving stage.
+        """
+        document, fields, chunks = group
+        batch = await self.embed.embedChunks(chunks)
+        batch.metadata["source"] = [document.source] * len(batch)
+        for name, value in fields.items():
+            batch.metadata[name] = [value] * len(batch)
+        batch.metadata.update(chunkFields(batch.texts))
+        if self.sparseEncoder:
+            batch.sparse = await asyncio.to_thread(self.sparseEncoder.encodeDocuments, batch.texts)
+        self.stats["chunks"] += len(chunks)
+        await output.put((document, batch))
+
+    async def _save(self, pending: list[tuple["_Document", EmbeddingBatch]]):
+        """
+        Saves embeddings to the database in a thread so the event loop keeps serving the other stages, then finishes
+        the documents whose last group was among them.
+
+        Args:
+            pending (list[tuple[_Document, EmbeddingBatch]]): The batches to join and save, with their documents.
+        """
+        batch = EmbeddingBatch.concat([batch for _, batch in pending])
+        await asyncio.to_thread(self.db.saveToDB, batch, self.collectionName)
+        self.stats["saved"] += len(batch)
+
+        for document, _ in pending:
+            document.pending -= 1
+            if document.chunked and not document.pending:
+                await self._finishDocument(document)
+
+    async def _saveWorker(self, input: asyncio.Queue):
+        """
+        Groups embeddings from the embedding stage into batches of saveBatchSize and saves them.
+
+        Args:
+            input (asyncio.Queue): The queue of the saving stage.
+        """
+        pending = []
+        pendingSize = 0
+        while (item := await input.get()) is not IngestPipeline._DONE:
+            pending.append(item)
+            pendingSize += len(item[1])
+            if pendingSize >= self.saveBatchSize:
+                await self._save(pending)
+                pending = []
+                pendingSize = 0
+
+        if pending:
+            await self._save(pending)
+
+    @staticmethod
+    async def _stage(workers: int, input: asyncio.Queue, handler: Callable[[Any], Awaitable[None]],
+                     output: asyncio.Queue=None, outputWorkers: int=0):
+        """
+        Runs the workers of a stage until they have all received the end marker, then passes one end marker to each
+        worker of the next stage.
+
+        Args:
+            workers (int): The amount of workers in the stage.
+            input (asyncio.Queue): The queue the workers take items from.
+            handler (Callable[[Any], Awaitable[None]]): Processes a single item.
+            output (asyncio.Queue): The queue of the next stage.
+            outputWorkers (int): The amount of workers in the next stage.
+        """
+        async def worker():
+            while (item := await input.get()) is not IngestPipeline._DONE:
+                await handler(item)
+
+        await asyncio.gather(*[worker() for _ in range(workers)])
+        for _ in range(outputWorkers):
+            await output.put(IngestPipeline._DONE)
+
+    async def run(self, documents: Iterable[str]) -> dict[str, float]:
+        """
+        Ingests documents into the collection.
+
+        Args:
+            documents (Iterable[str]): The paths of the documents to ingest, such as the output of fileSource.
+
+        Returns:
+            dict[str, float]: The amount of documents, embedded chunks, dropped duplicate chunks, unchanged chunks,
+            deleted stale chunks and saved embeddings processed and the elapsed seconds.
+        """
+        self.stats = {"documents": 0, "chunks": 0, "duplicates": 0, "unchanged": 0, "deleted": 0, "saved": 0,
+                      "seconds": 0.0}
+        start = perf_counter()
+        chunkQueue = asyncio.Queue(self.queueSize)
+        embedQueue = asyncio.Queue(self.queueSize)
+        saveQueue = asyncio.Queue(self.queueSize)
+
+        async def source():
+            for path in documents:
+                await chunkQueue.put(path)
+            for _ in range(self.chunkWorkers):
+                await chunkQueue.put(IngestPipeline._DONE)
+
+        tasks = [
+            asyncio.ensure_future(source()),
+            asyncio.ensure_future(IngestPipeline._stage(self.chunkWorkers, chunkQueue,
+                                                        lambda path: self._chunkDocument(path, embedQueue),
+                                                        embedQueue, self.embedWorkers)),
+            asyncio.ensure_future(IngestPipeline._stage(self.embedWorkers, embedQueue,
+                                                        lambda group: self._embedChunks(group, saveQueue),
+                                                        saveQueue, self.saveWorkers)),
+            *[asyncio.ensure_future(self._saveWorker(saveQueue)) for _ in range(self.saveWorkers)]
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # A failing stage would otherwise leave the other stages waiting on their queues
+            for task in tasks:
+                task.cancel()
+
+        self.stats["seconds"] = perf_counter() - start
+        return self.stats
@@ -1,11 +1,16 @@
 from .modelInterface import iModel
+from .conversationMemory import ConversationStore
+from .completionCache import CompletionCache
+from . import prompts
 from openai import OpenAI
 from os import environ
+from typing import Iterator
 class GPT(iModel):
     """
     Implementation of OpenAI's ChatGPT model.  Requires the environment variable "OPENAI_API_KEY" to be set.
     """
-    def __init__(self, systemMessage: str, model: str):
+    def __init__(self, systemMessage: str, model: str, client: OpenAI=None, conversations: ConversationStore=None,
+                 cache: CompletionCache=None):
         """
         Creates a client to communicate with the OpenAI API using the environment variable API key.
 
@@ -13,14 +18,47 @@ class GPT(iModel):
             systemMessage (str): The system message to provide to the completions model.
             model (str):  The model identifier for the client to use.  A current list can be
                 found at https://platform.openai.com/docs/models/gpt-4-and-gpt-4-turbo.
+            client (OpenAI): An existing client to reuse, keeping its pooled connections.  A new client is created if
+                not given.
+            conversations (ConversationStore): The histories of the sessions using the model, which can be shared
+                between instances.  A new store with the default token budget is created if not given.
+            cache (CompletionCache): An optional cache of completions consulted before a request is sent.  Identical
+                requests, such as replayed benchmarks and repeated HyDE drafts, are answered from the cache.
         """
-        self.client = OpenAI(api_key=environ["OPENAI_API_KEY"])
+        self.client = client if client else OpenAI(api_key=environ["OPENAI_API_KEY"])
         self.model = model
-        self.messages = [
-            {"role": "system", "content": systemMessage}
-        ]
+        self.systemMessage = systemMessage
+        self.conversations = conversations if conversations else ConversationStore()
+        self.cache = cache
 
-    def prompt(self, context: str, prompt: str) -> str:
+    def _complete(self, messages: list[dict[str, str]], bypassCache: bool=False, **options) -> str:
+        """
+        Requests a completion, answering from the cache if the same request was completed before.
+
+        Args:
+            messages (list[dict[str, str]]): The messages of the request.
+            bypassCache (bool): If True, the cache is not consulted and the new completion replaces the cached one.
+            **options: Further options of the request, such as the temperature.
+
+        Returns:
+            str: The completion.
+        """
+        if self.cache and not bypassCache:
+            completion = self.cache.get(self.model, messages)
+            if completion is not None:
+                return completion
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **options
+        )
+        completion = response.choices[0].message.content
+        if self.cache:
+            self.cache.put(self.model, messages, completion)
+        return completion
+
+    def prompt(self, context: str, prompt: str, sessionId: str="default", bypassCache: bool=False) -> str:
         """
         Method to prompt the language model with a statement or question, while providing context for
         improved responses.
@@ -28,33 +66,60 @@ class GPT(iModel):
         Args:
             context (str): A section of text that the model may find useful to more adequately respond to the prompt.
             prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to.  Earlier turns of the
+                conversation are sent without their context, within the token budget of the conversation store.
+            bypassCache (bool): If True, the completion cache is not consulted, see _complete.
+        """
+        memory = self.conversations.get(sessionId, self.systemMessage, self.model)
+        userMessage = prompts.userMessage(context, prompt)
+
+        response = self._complete(memory.messages(userMessage), bypassCache, temperature=0)
+        memory.addTurn(prompt, response, userMessage)
+
+        return response
 
-        TODO:
-            Remove context from past user prompts to save on token space.
+    def promptStream(self, context: str, prompt: str, sessionId: str="default",
+                     bypassCache: bool=False) -> Iterator[str]:
         """
-        self.messages.append({"role": "user",
-                              "content": f"CONTEXT:\n"
-                                         f"{context}\n"
-                                         f"QUESTION:\n"
-                                         f"{prompt}\n"
-                                         f"INSTRUCTIONS:\n"
-                                         f"The CONTEXT above are snippets of similar text towards the users question.\n"
-                                         f"Answer the users QUESTION using the CONTEXT text above.\n"
-                                         f"Keep your answer ground in the facts of the DOCUMENT.\n"
-                                         f"If the CONTEXT doesn’t contain the facts to answer the QUESTION then try to answer without the CONTEXT\n"
-                                         f"Explicitly say at the end of your statement whether the context was used to make your answer"}
-                             )
+        Prompts the language model like prompt, yielding the answer in pieces as they are generated instead of
+        waiting for the whole answer.  The answer is added to the conversation once it is complete, an answer that is
+        not read to the end is not remembered.
 
-        response = self.client.chat.completions.create(
+        Args:
+            context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+            prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to.
+            bypassCache (bool): If True, the completion cache is not consulted, see _complete.
+
+        Returns:
+            Iterator[str]: The pieces of the answer in order.
+        """
+        memory = self.conversations.get(sessionId, self.systemMessage, self.model)
+        userMessage = prompts.userMessage(context, prompt)
+
+        messages = memory.messages(userMessage)
+        cached = self.cache.get(self.model, messages) if self.cache and not bypassCache else None
+        if cached is not None:
+            yield cached
+            memory.addTurn(prompt, cached, userMessage)
+            return
+
+        stream = self.client.chat.completions.create(
             model=self.model,
-            messages=self.messages,
-            temperature=0
+            messages=messages,
+            temperature=0,
+            stream=True
         )
-        self.messages.append({"role": "assistant", "content": response.choices[0].message.content})
-
-        return response.choices[0].message.content
+        pieces = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        memory.addTurn(prompt, "".join(pieces), userMessage)
+        if self.cache:
+            self.cache.put(self.model, messages, "".join(pieces))
 
-    def hydePrompt(self, prompt: str) -> str:
+    def hydePrompt(self, prompt: str, bypassCache: bool=False) -> str:
         """
         Creates a hypothetical answer to a prompt.  This answer can be used to gain more relavance
         during semantic searches.
@@ -66,18 +131,13 @@ class GPT(iModel):
 
         Args:
             prompt (str): A question for the model to make a hypothetical response to.
+            bypassCache (bool): If True, the completion cache is not consulted.  HyDE drafts are not sampled
+                at temperature 0, bypassing the cache creates a new draft.
 
         Returns:
             str: A hypothetical answer to the prompt provided
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are used to create hypothetical documents for hypothetical document embedding.  Ensure that your responses will have enough relevance to the probable answer that it will retrieve the proper documents from a similarity search."},
-                {"role": "user", "content": prompt},
-            ]
-        )
-        return response.choices[0].message.content
+        return self._complete(prompts.hydeMessages(prompt), bypassCache)
 
 
 def testGPT():
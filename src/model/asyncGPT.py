@@ -0,0 +1,140 @@
+from .modelInterface import iAsyncModel
+from .conversationMemory import ConversationStore
+from .completionCache import CompletionCache
+from . import prompts
+from openai import AsyncOpenAI
+from os import environ
+from typing import AsyncIterator
+import asyncio
+
+
+class AsyncGPT(iAsyncModel):
+    """
+    Implementation of OpenAI's ChatGPT model on the asynchronous OpenAI client, sending the same messages as GPT.
+    Requires the environment variable "OPENAI_API_KEY" to be set if no client is given.
+    """
+    def __init__(self, systemMessage: str, model: str, client: AsyncOpenAI=None, conversations: ConversationStore=None,
+                 cache: CompletionCache=None):
+        """
+        Creates a client to communicate with the OpenAI API using the environment variable API key.
+
+        Args:
+            systemMessage (str): The system message to provide to the completions model.
+            model (str):  The model identifier for the client to use.
+            client (AsyncOpenAI): An existing client to reuse, keeping its pooled connections.  A new client is created
+                if not given.  Asynchronous clients are bound to the event loop they are first used on.
+            conversations (ConversationStore): The histories of the sessions using the model, which can be shared
+                with GPT instances.  A new store with the default token budget is created if not given.
+            cache (CompletionCache): An optional cache of completions consulted before a request is sent.  Identical
+                requests, such as replayed benchmarks and repeated HyDE drafts, are answered from the cache.
+        """
+        self.client = client if client else AsyncOpenAI(api_key=environ["OPENAI_API_KEY"])
+        self.model = model
+        self.systemMessage = systemMessage
+        self.conversations = conversations if conversations else ConversationStore()
+        self.cache = cache
+
+    async def _complete(self, messages: list[dict[str, str]], bypassCache: bool=False, **options) -> str:
+        """
+        Requests a completion, answering from the cache if the same request was completed before.
+
+        Args:
+            messages (list[dict[str, str]]): The messages of the request.
+            bypassCache (bool): If True, the cache is not consulted and the new completion replaces the cached one.
+            **options: Further options of the request, such as the temperature.
+
+        Returns:
+            str: The completion.
+        """
+        if self.cache and not bypassCache:
+            completion = await asyncio.to_thread(self.cache.get, self.model, messages)
+            if completion is not None:
+                return completion
+
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **options
+        )
+        completion = response.choices[0].message.content
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, self.model, messages, completion)
+        return completion
+
+    async def prompt(self, context: str, prompt: str, sessionId: str="default", bypassCache: bool=False) -> str:
+        """
+        Method to prompt the language model with a statement or question, while providing context for
+        improved responses.
+
+        Args:
+            context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+            prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to.
+            bypassCache (bool): If True, the completion cache is not consulted, see _complete.
+
+        Returns:
+            str: The models response to the prompt
+        """
+        memory = self.conversations.get(sessionId, self.systemMessage, self.model)
+        userMessage = prompts.userMessage(context, prompt)
+
+        response = await self._complete(memory.messages(userMessage), bypassCache, temperature=0)
+        memory.addTurn(prompt, response, userMessage)
+
+        return response
+
+    async def promptStream(self, context: str, prompt: str, sessionId: str="default",
+                           bypassCache: bool=False) -> AsyncIterator[str]:
+        """
+        Prompts the language model like prompt, yielding the answer in pieces as they are generated.  The answer is
+        added to the conversation once it is complete.
+
+        Args:
+            context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+            prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to.
+            bypassCache (bool): If True, the completion cache is not consulted, see _complete.
+
+        Returns:
+            AsyncIterator[str]: The pieces of the answer in order.
+        """
+        memory = self.conversations.get(sessionId, self.systemMessage, self.model)
+        userMessage = prompts.userMessage(context, prompt)
+
+        messages = memory.messages(userMessage)
+        cached = None
+        if self.cache and not bypassCache:
+            cached = await asyncio.to_thread(self.cache.get, self.model, messages)
+        if cached is not None:
+            yield cached
+            memory.addTurn(prompt, cached, userMessage)
+            return
+
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0,
+            stream=True
+        )
+        pieces = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        memory.addTurn(prompt, "".join(pieces), userMessage)
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, self.model, messages, "".join(pieces))
+
+    async def hydePrompt(self, prompt: str, bypassCache: bool=False) -> str:
+        """
+        Creates a hypothetical answer to a prompt, see GPT.hydePrompt.
+
+        Args:
+            prompt (str): A question for the model to make a hypothetical response to.
+            bypassCache (bool): If True, the completion cache is not consulted.  HyDE drafts are not sampled
+                at temperature 0, bypassing the cache creates a new draft.
+
+        Returns:
+            str: A hypothetical answer to the prompt provided
+        """
+        return await self._complete(prompts.hydeMessages(prompt), bypassCache)
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CompletionCache:
+    """
+    An exact-match cache of completions, with a least recently used tier in memory in front of an optional SQLite tier
+    on disk.  Entries are keyed by a hash of the model and every message sent, which holds the system message, the
+    retrieved context and the question, so a completion is only reused for an identical request.  Replayed benchmarks
+    and repeated HyDE drafts are answered without calling the API.  Entries expire after a time to live and the least
+    recently used entries of each tier are evicted once it is full.
+    """
+    def __init__(self, path: str=None, maxEntries: int=100000, memoryEntries: int=1024, ttlSeconds: float=604800):
+        """
+        Opens (or creates) the cache.
+
+        Args:
+            path (str): The path of the SQLite file to store the disk tier in.  Missing parent directories are created.
+                If not given, only the memory tier is used.
+            maxEntries (int): The maximum amount of completions kept on disk.
+            memoryEntries (int): The maximum amount of completions kept in memory.
+            ttlSeconds (float): The amount of seconds after which a completion is no longer reused.
+        """
+        self.path = path
+        self.maxEntries = maxEntries
+        self.memoryEntries = memoryEntries
+        self.ttlSeconds = ttlSeconds
+        self.hits = 0
+        self.misses = 0
+        self.memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        # An upper bound of the rows on disk, replaced entries are counted again until the next eviction
+        self._rows = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            with self._connection:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS completions ("
+                                         "key TEXT PRIMARY KEY, "
+                                         "completion TEXT NOT NULL, "
+                                         "created REAL NOT NULL, "
+                                         "lastUsed REAL NOT NULL)")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS completionsLastUsed ON completions (lastUsed)")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS completionsCreated ON completions (created)")
+            self._rows = self._connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    @staticmethod
+    def makeKey(model: str, messages: list[dict[str, str]]) -> str:
+        """
+        Creates the address of a request.
+
+        Args:
+            model (str): The identifier of the completion model.
+            messages (list[dict[str, str]]): The messages of the request.
+
+        Returns:
+            str: A hex digest identifying the model and messages combination.
+        """
+        return hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, model: str, messages: list[dict[str, str]]) -> Optional[str]:
+        """
+        Looks up the completion of a request, updating the hit and miss counters.  Completions found on disk are
+        promoted to the memory tier.
+
+        Args:
+            model (str): The identifier of the completion model.
+            messages (list[dict[str, str]]): The messages of the request.
+
+        Returns:
+            str: The cached completion, or None if the request is not cached or has expired.
+        """
+        key = CompletionCache.makeKey(model, messages)
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttlSeconds:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.memory.pop(key, None)
+
+            if self._connection:
+                row = self._connection.execute("SELECT completion, created FROM completions WHERE key = ? AND "
+                                               "created >= ?", (key, now - self.ttlSeconds)).fetchone()
+                if row:
+                    with self._connection:
+                        self._connection.execute("UPDATE completions SET lastUsed = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, messages: list[dict[str, str]], completion: str):
+        """
+        Stores the completion of a request in both tiers, evicting the least recently used entries if a tier is full.
+        The disk tier is only evicted once it may have grown past maxEntries.
+
+        Args:
+            model (str): The identifier of the completion model.
+            messages (list[dict[str, str]]): The messages of the request.
+            completion (str): The completion of the request.
+        """
+        key = CompletionCache.makeKey(model, messages)
+        now = time.time()
+        with self._lock:
+            self._remember(key, completion, now)
+            if self._connection:
+                with self._connection:
+                    self._connection.execute("INSERT OR REPLACE INTO completions (key, completion, created, lastUsed) "
+                                             "VALUES (?, ?, ?, ?)", (key, completion, now, now))
+                self._rows += 1
+                if self._rows > self.maxEntries:
+                    self._evict(now)
+
+    def _remember(self, key: str, completion: str, created: float):
+        """
+        Adds a completion to the memory tier.  Must be called with the lock held.
+
+        Args:
+            key (str): The address of the request.
+            completion (str): The completion of the request.
+            created (float): The time the completion was created.
+        """
+        self.memory[key] = (completion, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memoryEntries:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """
+        Removes the expired entries of the disk tier and the least recently used entries until it is a tenth below
+        maxEntries, so the next eviction only runs after many more completions have been stored.  Must be called with
+        the lock held.
+
+        Args:
+            now (float): The current time.
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM completions WHERE created < ?", (now - self.ttlSeconds,))
+            count = self._connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            target = self.maxEntries - self.maxEntries // 10
+            if count > target:
+                self._connection.execute("DELETE FROM completions WHERE key IN "
+                                         "(SELECT key FROM completions ORDER BY lastUsed ASC LIMIT ?)",
+                                         (count - target,))
+                count = target
+        self._rows = count
+
+    def clear(self):
+        """
+        Removes every completion from both tiers.
+        """
+        with self._lock:
+            self.memory.clear()
+            if self._connection:
+                with self._connection:
+                    self._connection.execute("DELETE FROM completions")
+                self._rows = 0
+
+    @property
+    def hitRate(self) -> float:
+        """
+        float: The fraction of lookups that were served from the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        """
+        Closes the connection to the disk tier.
+        """
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,120 @@
+from qdrant_client.http.models import ScoredPoint
+from ..embed.embedPrepper import EmbedPrepper
+import re
+
+
+class ContextAssembler:
+    """
+    Turns search results into the context of a prompt.  Results are flattened across collections, ordered by score,
+    stripped of duplicate and overlapping chunks, and only the text of as many results as fit the token budget is kept.
+    Sending the text alone instead of the representation of the results keeps IDs, versions and scores out of the
+    prompt.
+    """
+    WORD_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, model: str="gpt-4-turbo-preview", maxTokens: int=3000, overlapThreshold: float=0.8,
+                 shingleSize: int=3):
+        """
+        Constructor for the assembler.
+
+        Args:
+            model (str): The completion model the context is sent to, whose tokenizer measures the context.
+            maxTokens (int): The maximum amount of tokens of the context.
+            overlapThreshold (float): The fraction of the word shingles of a chunk that must appear in a higher scoring
+                chunk for it to be dropped as overlapping, such as the neighbouring chunks of a document that share
+                their overlap.
+            shingleSize (int): The amount of consecutive words compared to detect overlap.
+        """
+        self.encoding = EmbedPrepper.getEncoding(model)
+        self.maxTokens = maxTokens
+        self.overlapThreshold = overlapThreshold
+        self.shingleSize = shingleSize
+
+    @staticmethod
+    def flatten(results: list[ScoredPoint | list[ScoredPoint]]) -> list[ScoredPoint]:
+        """
+        Flattens the results of one or several collections into one list ordered by score.
+
+        Args:
+            results (list[ScoredPoint | list[ScoredPoint]]): The results of queryDB, or a list of the results of
+                several queries.
+
+        Returns:
+            list[ScoredPoint]: Every result, highest score first.
+        """
+        points = []
+        for result in results:
+            if isinstance(result, (list, tuple)):
+                points.extend(result)
+            else:
+                points.append(result)
+        return sorted(points, key=lambda point: point.score, reverse=True)
+
+    def _shingles(self, text: str) -> set[str]:
+        """
+        Splits a text into overlapping word shingles.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            set[str]: The shingles of the text.
+        """
+        words = ContextAssembler.WORD_PATTERN.findall(text.lower())
+        return {" ".join(words[index:index + self.shingleSize])
+                for index in range(max(1, len(words) - self.shingleSize + 1))}
+
+    def assemble(self, results: list[ScoredPoint | list[ScoredPoint]],
+                 measureSavings: bool=False) -> tuple[str, dict[str, int]]:
+        """
+        Assembles the context of a prompt from search results.
+
+        Args:
+            results (list[ScoredPoint | list[ScoredPoint]]): The results of queryDB, or a list of the results of
+                several queries.
+            measureSavings (bool): If True, the representation of the raw results is tokenized to measure the tokens
+                saved by the context.  This costs as much as tokenizing every result with its vector and metadata, so
+                it is only meant for reporting.
+
+        Returns:
+            tuple[str, dict[str, int]]: The context, and the amount of results, dropped duplicate or overlapping
+            results, included results and tokens of the context.  If measureSavings is set, also the tokens of the
+            representation of the raw results and the tokens saved.
+        """
+        points = ContextAssembler.flatten(results)
+        stats = {"results": len(points), "duplicates": 0, "included": 0, "tokens": 0}
+
+        seen = set()
+        keptShingles = []
+        snippets = []
+        for point in points:
+            payload = point.payload or dict()
+            text = payload.get("text", "").strip()
+            key = payload.get("chunkHash", text)
+            if not text or key in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(key)
+
+            shingles = self._shingles(text)
+            if any(len(shingles & kept) >= self.overlapThreshold * len(shingles) for kept in keptShingles):
+                stats["duplicates"] += 1
+                continue
+
+            source = payload.get("source")
+            snippet = f"[{len(snippets) + 1}] {source}\n{text}" if source else f"[{len(snippets) + 1}]\n{text}"
+            # Separated by a blank line, which takes one more token
+            tokens = len(self.encoding.encode_ordinary(snippet)) + 1
+            if stats["tokens"] + tokens > self.maxTokens:
+                # A shorter result further down may still fit
+                continue
+
+            keptShingles.append(shingles)
+            snippets.append(snippet)
+            stats["tokens"] += tokens
+            stats["included"] += 1
+
+        if measureSavings:
+            stats["rawTokens"] = len(self.encoding.encode_ordinary(str(results)))
+            stats["savedTokens"] = max(0, stats["rawTokens"] - stats["tokens"])
+        return "\n\n".join(snippets), stats
@@ -0,0 +1,161 @@
+from ..embed.embedPrepper import EmbedPrepper
+from collections import OrderedDict, deque
+from time import monotonic
+import threading
+import tiktoken
+
+
+class ConversationMemory:
+    """
+    The history of a single conversation, kept within a token budget.  Only the latest question is sent with its
+    retrieved context, earlier turns keep their question and answer but drop the context, which is by far the largest
+    part of a turn.  Once the history no longer fits the budget the oldest turns are dropped.  A memory may be read
+    and updated by concurrent requests of the same session, its turns are guarded by a lock.
+    """
+    # Tokens the chat format adds around every message
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, systemMessage: str, encoding: tiktoken.Encoding, maxTokens: int=8000, contextTurns: int=0):
+        """
+        Constructor for the memory.
+
+        Args:
+            systemMessage (str): The system message sent at the start of every request.
+            encoding (tiktoken.Encoding): The tokenizer of the completion model, used to measure the messages.
+            maxTokens (int): The maximum amount of tokens of the messages sent in a request, including the system
+                message and the latest question with its context.
+            contextTurns (int): The amount of earlier turns that keep their retrieved context.
+        """
+        self.encoding = encoding
+        self.maxTokens = maxTokens
+        self.contextTurns = contextTurns
+        self.system = {"role": "system", "content": systemMessage}
+        self.systemTokens = self.countTokens(self.system)
+        # Each turn holds the question without context, the question with context and the answer, with their tokens
+        self.turns = deque()
+        self.lastUsed = monotonic()
+        self._lock = threading.Lock()
+
+    def countTokens(self, message: dict[str, str]) -> int:
+        """
+        Measures a message.
+
+        Args:
+            message (dict[str, str]): The message to measure.
+
+        Returns:
+            int: The amount of tokens the message takes up in a request.
+        """
+        return len(self.encoding.encode_ordinary(message["content"])) + ConversationMemory.MESSAGE_OVERHEAD
+
+    def messages(self, userMessage: dict[str, str]) -> list[dict[str, str]]:
+        """
+        Creates the messages of a request, fitting as many of the most recent turns as the budget allows.
+
+        Args:
+            userMessage (dict[str, str]): The latest question with its context.
+
+        Returns:
+            list[dict[str, str]]: The system message, the history and the latest question.
+        """
+        budget = self.maxTokens - self.systemTokens - self.countTokens(userMessage)
+        with self._lock:
+            self.lastUsed = monotonic()
+            turns = list(self.turns)
+
+        history = []
+        for index, turn in enumerate(reversed(turns)):
+            question, questionTokens = turn[1] if index < self.contextTurns else turn[0]
+            answer, answerTokens = turn[2]
+            if questionTokens + answerTokens > budget:
+                break
+            budget -= questionTokens + answerTokens
+            history[:0] = [question, answer]
+        return [self.system] + history + [userMessage]
+
+    def addTurn(self, question: str, answer: str, userMessage: dict[str, str]=None):
+        """
+        Records a completed turn, dropping the oldest turns that can no longer be sent.
+
+        Args:
+            question (str): The question without its context.
+            answer (str): The answer of the model.
+            userMessage (dict[str, str]): The question as it was sent, with its context.  Defaults to the question.
+        """
+        plain = {"role": "user", "content": question}
+        plain = (plain, self.countTokens(plain))
+        withContext = (userMessage, self.countTokens(userMessage)) if userMessage else plain
+        reply = {"role": "assistant", "content": answer}
+        reply = (reply, self.countTokens(reply))
+
+        with self._lock:
+            self.turns.append((plain, withContext, reply))
+            self.lastUsed = monotonic()
+
+            total = sum(turn[0][1] + turn[2][1] for turn in self.turns)
+            while self.turns and total > self.maxTokens - self.systemTokens:
+                turn = self.turns.popleft()
+                total -= turn[0][1] + turn[2][1]
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+
+class ConversationStore:
+    """
+    Keeps a separate ConversationMemory for every session, so concurrent users do not share a history.  Sessions idle
+    for longer than the time to live are forgotten, and the least recently used sessions are evicted once there are
+    more than maxSessions.
+    """
+    def __init__(self, maxTokens: int=8000, contextTurns: int=0, maxSessions: int=1000, ttlSeconds: float=3600):
+        """
+        Constructor for the store.
+
+        Args:
+            maxTokens (int): The token budget of every conversation, see ConversationMemory.
+            contextTurns (int): The amount of earlier turns that keep their retrieved context.
+            maxSessions (int): The maximum amount of conversations kept.
+            ttlSeconds (float): The amount of idle seconds after which a conversation is forgotten.
+        """
+        self.maxTokens = maxTokens
+        self.contextTurns = contextTurns
+        self.maxSessions = maxSessions
+        self.ttlSeconds = ttlSeconds
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sessionId: str, systemMessage: str, model: str) -> ConversationMemory:
+        """
+        Retrieves the conversation of a session, starting a new one if there is none.
+
+        Args:
+            sessionId (str): The identifier of the session.
+            systemMessage (str): The system message of a new conversation.
+            model (str): The completion model, whose tokenizer measures a new conversation.
+
+        Returns:
+            ConversationMemory: The conversation of the session.
+        """
+        with self._lock:
+            memory = self.sessions.get(sessionId)
+            if memory is not None and monotonic() - memory.lastUsed > self.ttlSeconds:
+                memory = None
+            if memory is None:
+                memory = ConversationMemory(systemMessage, EmbedPrepper.getEncoding(model), self.maxTokens,
+                                            self.contextTurns)
+                self.sessions[sessionId] = memory
+            self.sessions.move_to_end(sessionId)
+
+            while len(self.sessions) > self.maxSessions:
+                self.sessions.popitem(last=False)
+            return memory
+
+    def reset(self, sessionId: str):
+        """
+        Forgets the conversation of a session.
+
+        Args:
+            sessionId (str): The identifier of the session.
+        """
+        with self._lock:
+            self.sessions.pop(sessionId, None)
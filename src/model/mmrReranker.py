@@ -0,0 +1,91 @@
+from qdrant_client.http.models import ScoredPoint
+from .rerankerInterface import iReranker
+import numpy as np
+
+
+class MMRReranker(iReranker):
+    """
+    Selects a diverse set of results with maximal marginal relevance.  Results are picked one at a time, each time
+    taking the result with the best trade-off between its relevance to the question and its similarity to the results
+    already picked.  Near-identical chunks, such as the sections of one advisory repeated across its pages, are picked
+    once instead of filling the context.  Relevance is the score the results were retrieved with, which keeps the
+    fused keyword and HyDE rankings, or the scores of another reranker such as a cross-encoder.  The vectors of the
+    results are only used to measure how similar they are to each other.
+    """
+    def __init__(self, diversity: float=0.3, relevance: iReranker=None):
+        """
+        Constructor for the reranker.
+
+        Args:
+            diversity (float): How strongly results similar to the picked results are penalized, from 0 for ranking by
+                relevance alone to 1 for ignoring relevance after the first pick.
+            relevance (iReranker): An optional reranker scoring the relevance of every result in place of the
+                retrieval scores.  Either score is scaled to between 0 and 1 before being traded off against the
+                similarity between results.
+        """
+        if not 0 <= diversity <= 1:
+            raise ValueError(f"The diversity must be between 0 and 1, got {diversity}")
+        self.diversity = diversity
+        self.relevance = relevance
+
+    def _relevance(self, query: str, embedding: list[float], points: list[ScoredPoint]) -> np.ndarray:
+        """
+        Scores the relevance of every result to the question, scaled to between 0 and 1.
+
+        Args:
+            query (str): The question.
+            embedding (list[float]): The embedding of the question.
+            points (list[ScoredPoint]): The results.
+
+        Returns:
+            np.ndarray: The relevance of each result, in the order of the results.
+        """
+        if self.relevance is None:
+            scores = {point.id: point.score for point in points}
+        else:
+            # The scores are read before the reranker may replace them
+            original = [point.score for point in points]
+            scores = {point.id: point.score for point in self.relevance.rerank(query, embedding, points, len(points))}
+            for point, score in zip(points, original):
+                point.score = score
+        relevance = np.array([scores.get(point.id, -np.inf) for point in points], dtype=np.float32)
+        known = np.isfinite(relevance)
+        if not known.any():
+            return np.zeros(len(points), dtype=np.float32)
+        low, high = relevance[known].min(), relevance[known].max()
+        relevance = (relevance - low) / (high - low) if high > low else np.where(known, 1.0, 0.0)
+        # Results the reranker dropped are only picked once every scored result has been
+        return np.where(known, relevance, -1.0).astype(np.float32)
+
+    def rerank(self, query: str, embedding: list[float], points: list[ScoredPoint], topN: int) -> list[ScoredPoint]:
+        """
+        Selects a diverse set of relevant results.
+
+        Args:
+            query (str): The question.
+            embedding (list[float]): The embedding of the question.
+            points (list[ScoredPoint]): The retrieved results, holding their vectors.
+            topN (int): The maximum amount of results to select.
+
+        Returns:
+            list[ScoredPoint]: The selected results in the order they were picked, keeping their original scores.  If
+            a result has no vector, the topN results with the best score are returned instead.
+        """
+        if len(points) <= 1 or any(point.vector is None for point in points):
+            return sorted(points, key=lambda point: point.score, reverse=True)[:topN]
+
+        vectors = np.array([point.vector for point in points], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        relevance = self._relevance(query, embedding, points)
+        similarity = vectors @ vectors.T
+        redundancy = np.zeros(len(points), dtype=np.float32)
+        available = np.ones(len(points), dtype=bool)
+        selected = []
+        for _ in range(min(topN, len(points))):
+            scores = (1 - self.diversity) * relevance - self.diversity * redundancy
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, similarity[best])
+        return [points[index] for index in selected]
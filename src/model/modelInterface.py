@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator
 
 class iModel(ABC):
     """
@@ -7,7 +8,7 @@ class iModel(ABC):
     as simple and accurate as possible.
     """
     @abstractmethod
-    def prompt(self, context: str, prompt: str) -> str:
+    def prompt(self, context: str, prompt: str, sessionId: str="default") -> str:
         """
         Method to prompt the language model with a statement or question, while providing context for
         improved responses.
@@ -15,12 +16,30 @@ class iModel(ABC):
         Args:
             context (str): A section of text that the model may find useful to more adequately respond to the prompt.
             prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to, each conversation has its own
+                history.
 
         Returns:
             str: The models response to the prompt
         """
         pass
 
+    @abstractmethod
+    def promptStream(self, context: str, prompt: str, sessionId: str="default") -> Iterator[str]:
+        """
+        Streaming variant of prompt, yielding the response in pieces as the model generates it.  The complete response
+        is added to the history of the conversation once the last piece has been read.
+
+        Args:
+            context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+            prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to.
+
+        Returns:
+            Iterator[str]: The pieces of the models response, in order.
+        """
+        pass
+
     @abstractmethod
     def hydePrompt(self, prompt: str) -> str:
         """
@@ -38,4 +57,56 @@ class iModel(ABC):
         Returns:
             str: A hypothetical answer to the prompt provided
         """
-        pass
\ No newline at end of file
+        pass
+
+
+class iAsyncModel(ABC):
+    """
+    The asynchronous counterpart of iModel, for language models whose requests should not block the event loop so
+    they can run concurrently with embedding and search work.
+    """
+    @abstractmethod
+    async def prompt(self, context: str, prompt: str, sessionId: str="default") -> str:
+        """
+        Method to prompt the language model with a statement or question, while providing context for
+        improved responses.
+
+        Args:
+            context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+            prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to, each conversation has its own
+                history.
+
+        Returns:
+            str: The models response to the prompt
+        """
+        pass
+
+    @abstractmethod
+    def promptStream(self, context: str, prompt: str, sessionId: str="default") -> AsyncIterator[str]:
+        """
+        Streaming variant of prompt, yielding the response in pieces as the model generates it.  The complete response
+        is added to the history of the conversation once the last piece has been read.
+
+        Args:
+            context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+            prompt (str): A string to ask the language model with.
+            sessionId (str): The identifier of the conversation the prompt belongs to.
+
+        Returns:
+            AsyncIterator[str]: The pieces of the models response, in order.
+        """
+        pass
+
+    @abstractmethod
+    async def hydePrompt(self, prompt: str) -> str:
+        """
+        Creates a hypothetical answer to a prompt, see iModel.hydePrompt.
+
+        Args:
+            prompt (str): A question for the model to make a hypothetical response to.
+
+        Returns:
+            str: A hypothetical answer to the prompt provided
+        """
+        pass
@@ -0,0 +1,44 @@
+"""
+The messages sent to the completion models, shared by the synchronous and asynchronous models so both ask the same
+questions.
+"""
+
+
+def userMessage(context: str, prompt: str) -> dict[str, str]:
+    """
+    Creates the message asking a question with its context.
+
+    Args:
+        context (str): A section of text that the model may find useful to more adequately respond to the prompt.
+        prompt (str): A string to ask the language model with.
+
+    Returns:
+        dict[str, str]: The user message.
+    """
+    return {"role": "user",
+            "content": f"CONTEXT:\n"
+                       f"{context}\n"
+                       f"QUESTION:\n"
+                       f"{prompt}\n"
+                       f"INSTRUCTIONS:\n"
+                       f"The CONTEXT above are snippets of similar text towards the users question.\n"
+                       f"Answer the users QUESTION using the CONTEXT text above.\n"
+                       f"Keep your answer ground in the facts of the DOCUMENT.\n"
+                       f"If the CONTEXT doesn’t contain the facts to answer the QUESTION then try to answer without the CONTEXT\n"
+                       f"Explicitly say at the end of your statement whether the context was used to make your answer"}
+
+
+def hydeMessages(prompt: str) -> list[dict[str, str]]:
+    """
+    Creates the messages asking for a hypothetical answer to a question, see iModel.hydePrompt.
+
+    Args:
+        prompt (str): A question for the model to make a hypothetical response to.
+
+    Returns:
+        list[dict[str, str]]: The system and user messages.
+    """
+    return [
+        {"role": "system", "content": "You are used to create hypothetical documents for hypothetical document embedding.  Ensure that your responses will have enough relevance to the probable answer that it will retrieve the proper documents from a similarity search."},
+        {"role": "user", "content": prompt},
+    ]
@@ -0,0 +1,25 @@
+from abc import ABC, abstractmethod
+from qdrant_client.http.models import ScoredPoint
+
+
+class iReranker(ABC):
+    """
+    An interface for reranking stages, which select the results sent to the model from a larger amount of retrieved
+    results.  Rerankers can use the question, its embedding and the results with their vectors, see the withVectors
+    option of iVectorDB.queryDB.
+    """
+    @abstractmethod
+    def rerank(self, query: str, embedding: list[float], points: list[ScoredPoint], topN: int) -> list[ScoredPoint]:
+        """
+        Selects the best results for a question.
+
+        Args:
+            query (str): The question.
+            embedding (list[float]): The embedding of the question.
+            points (list[ScoredPoint]): The retrieved results.
+            topN (int): The maximum amount of results to select.
+
+        Returns:
+            list[ScoredPoint]: The selected results, best first.
+        """
+        pass
@@ -0,0 +1,166 @@
+from qdrant_client.http.models import ScoredPoint
+from ..database.DBInterface import iVectorDB
+from ..database.fusion import reciprocalRankFusion
+from ..embed.embedInterface import iEmbed
+from ..embed.sparseEncoder import SparseEncoder, SparseVector
+from .modelInterface import iAsyncModel
+from .contextAssembler import ContextAssembler
+from .rerankerInterface import iReranker
+from time import perf_counter
+from typing import Any
+import asyncio
+
+
+class RetrievalOrchestrator:
+    """
+    Retrieves the context of a question with the direct and HyDE searches running concurrently.  The question is
+    embedded and searched while the model drafts its hypothetical answer, then the draft is embedded and searched, and
+    both rankings are fused into the context of a single completion.  The latency of a HyDE question is roughly that
+    of the slower of the two searches instead of their sum.  An optional reranker narrows the fused results down to
+    the few that are sent to the model, so more results can be retrieved than fit the prompt.
+    """
+    def __init__(self, db: iVectorDB, embed: iEmbed, assembler: ContextAssembler, sparseEncoder: SparseEncoder=None,
+                 maxHits: int=50, reranker: iReranker=None, topN: int=10, measureSavings: bool=False):
+        """
+        Constructor for the orchestrator.
+
+        Args:
+            db (iVectorDB): The database to search.
+            embed (iEmbed): The embedding model of the searched collections.
+            assembler (ContextAssembler): Turns the fused results into the context of the prompt.
+            sparseEncoder (SparseEncoder): If given, the keywords of the question are also searched, see
+                iVectorDB.queryDB.
+            maxHits (int): The amount of results of each search, and of the fused results.
+            reranker (iReranker): If given, the fused results are retrieved with their vectors and reranked, keeping
+                topN of them.
+            topN (int): The amount of results kept by the reranker.
+            measureSavings (bool): If True, the tokens saved by the context are measured, see
+                ContextAssembler.assemble.
+        """
+        self.db = db
+        self.embed = embed
+        self.assembler = assembler
+        self.sparseEncoder = sparseEncoder
+        self.maxHits = maxHits
+        self.reranker = reranker
+        self.topN = topN
+        self.measureSavings = measureSavings
+
+    async def _search(self, embedding: list[float], collectionNames: list[str], keywords: SparseVector,
+                      filter: dict[str, Any]) -> list[ScoredPoint]:
+        """
+        Searches the database on a worker thread, since its client is synchronous.
+
+        Args:
+            embedding (list[float]): The embedding to search with.
+            collectionNames (list[str]): The collections to search.
+            keywords (SparseVector): The keywords of the question, or None.
+            filter (dict[str, Any]): The payload filter of the search, or None.
+
+        Returns:
+            list[ScoredPoint]: The results of the search.
+        """
+        return await asyncio.to_thread(self.db.queryDB, embedding, collectionNames, self.maxHits,
+                                       sparseQuery=keywords, filter=filter, withVectors=self.reranker is not None)
+
+    async def _directSearch(self, prompt: str, collectionNames: list[str], keywords: SparseVector,
+                            filter: dict[str, Any],
+                            embedding: list[float]=None) -> tuple[list[float], list[ScoredPoint]]:
+        """
+        Searches with the embedding of the question.
+
+        Args:
+            prompt (str): The question.
+            collectionNames (list[str]): The collections to search.
+            keywords (SparseVector): The keywords of the question, or None.
+            filter (dict[str, Any]): The payload filter of the search, or None.
+            embedding (list[float]): The embedding of the question, if it was already created.
+
+        Returns:
+            tuple[list[float], list[ScoredPoint]]: The embedding of the question and the results of the search.
+        """
+        if embedding is None:
+            embedding = await self.embed.embedQuery(prompt)
+        return embedding, await self._search(embedding, collectionNames, keywords, filter)
+
+    async def _hydeSearch(self, model: iAsyncModel, prompt: str, collectionNames: list[str], keywords: SparseVector,
+                          filter: dict[str, Any]) -> list[ScoredPoint]:
+        """
+        Searches with the embedding of a hypothetical answer to the question.
+
+        Args:
+            model (iAsyncModel): The model drafting the hypothetical answer.
+            prompt (str): The question.
+            collectionNames (list[str]): The collections to search.
+            keywords (SparseVector): The keywords of the question, or None.
+            filter (dict[str, Any]): The payload filter of the search, or None.
+
+        Returns:
+            list[ScoredPoint]: The results of the search.
+        """
+        draft = await model.hydePrompt(prompt)
+        return await self._search(await self.embed.embedQuery(draft), collectionNames, keywords, filter)
+
+    async def retrieve(self, model: iAsyncModel, prompt: str, collectionNames: list[str], hyde: bool=True,
+                       filter: dict[str, Any]=None, embedding: list[float]=None) -> tuple[str, dict[str, float]]:
+        """
+        Retrieves the context of a question.
+
+        Args:
+            model (iAsyncModel): The model drafting the hypothetical answer.
+            prompt (str): The question.
+            collectionNames (list[str]): The collections to search.
+            hyde (bool): If True, the direct search is fused with a search on a hypothetical answer.  Otherwise only
+                the direct search is run.
+            filter (dict[str, Any]): Only chunks whose payload matches the filter are retrieved, see database.filters.
+            embedding (list[float]): The embedding of the question, if it was already created.
+
+        Returns:
+            tuple[str, dict[str, float]]: The context, and the statistics of ContextAssembler.assemble along with the
+            amount of results retrieved before reranking and the elapsed seconds of the retrieval.
+        """
+        start = perf_counter()
+        keywords = self.sparseEncoder.encodeQuery(prompt) if self.sparseEncoder else None
+        searches = [self._directSearch(prompt, collectionNames, keywords, filter, embedding)]
+        if hyde:
+            searches.append(self._hydeSearch(model, prompt, collectionNames, keywords, filter))
+        (embedding, results), *hydeResults = await asyncio.gather(*searches)
+
+        if hydeResults:
+            results = reciprocalRankFusion([results] + hydeResults, self.maxHits)
+        retrieved = len(results)
+        if self.reranker:
+            results = self.reranker.rerank(prompt, embedding, results, self.topN)
+            if self.measureSavings:
+                # The vectors are only retrieved for reranking and would bloat the measure of the raw results
+                for point in results:
+                    point.vector = None
+        context, stats = self.assembler.assemble(results, self.measureSavings)
+        stats["retrieved"] = retrieved
+        stats["seconds"] = perf_counter() - start
+        return context, stats
+
+    async def answer(self, model: iAsyncModel, prompt: str, collectionNames: list[str], sessionId: str="default",
+                     hyde: bool=True, filter: dict[str, Any]=None,
+                     embedding: list[float]=None) -> tuple[str, dict[str, float]]:
+        """
+        Retrieves the context of a question and answers it with a single completion.
+
+        Args:
+            model (iAsyncModel): The model drafting the hypothetical answer and answering the question.
+            prompt (str): The question.
+            collectionNames (list[str]): The collections to search.
+            sessionId (str): The identifier of the conversation the question belongs to.
+            hyde (bool): If True, the direct search is fused with a search on a hypothetical answer.
+            filter (dict[str, Any]): Only chunks whose payload matches the filter are retrieved, see database.filters.
+            embedding (list[float]): The embedding of the question, if it was already created.
+
+        Returns:
+            tuple[str, dict[str, float]]: The answer, and the statistics of retrieve along with the total elapsed
+            seconds.
+        """
+        start = perf_counter()
+        context, stats = await self.retrieve(model, prompt, collectionNames, hyde, filter, embedding)
+        response = await model.prompt(context, prompt, sessionId)
+        stats["totalSeconds"] = perf_counter() - start
+        return response, stats
@@ -0,0 +1,258 @@
+from ..embed.sparseEncoder import SparseEncoder
+from collections import OrderedDict
+from time import monotonic
+import itertools
+import numpy as np
+import threading
+
+
+class _Partition:
+    """
+    The question vectors of one collection and model, kept in a preallocated matrix.  Removed entries free their row
+    for the next stored question, and the matrix doubles in size when it is full, so storing and removing an entry
+    does not copy the other vectors.
+    """
+    def __init__(self, dimensions: int, capacity: int=64):
+        """
+        Constructor for the partition.
+
+        Args:
+            dimensions (int): The size of the question vectors.
+            capacity (int): The initial amount of rows.
+        """
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        # The entry ID of each row, -1 for rows that are free
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.rows = dict()
+        self.free = []
+        # Rows at or above used have never held an entry
+        self.used = 0
+
+    def add(self, id: int, vector: np.ndarray):
+        """
+        Stores the vector of an entry.
+
+        Args:
+            id (int): The ID of the entry.
+            vector (np.ndarray): The normalized question vector.
+        """
+        if self.free:
+            row = self.free.pop()
+        else:
+            if self.used == len(self.ids):
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+                self.ids = np.concatenate([self.ids, np.full(len(self.ids), -1, dtype=np.int64)])
+            row = self.used
+            self.used += 1
+        self.vectors[row] = vector
+        self.ids[row] = id
+        self.rows[id] = row
+
+    def remove(self, id: int):
+        """
+        Frees the row of an entry.
+
+        Args:
+            id (int): The ID of the entry.
+        """
+        row = self.rows.pop(id)
+        self.ids[row] = -1
+        self.free.append(row)
+
+    def similarities(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compares a question with every stored question.
+
+        Args:
+            query (np.ndarray): The normalized question vector.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The entry ID and the cosine similarity of every row, with -inf for free
+            rows.
+        """
+        ids = self.ids[:self.used]
+        similarities = self.vectors[:self.used] @ query
+        similarities[ids < 0] = -np.inf
+        return ids, similarities
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class SemanticCache:
+    """
+    Caches the answers of the RAG pipeline by the embedding of the question.  A question whose embedding is close
+    enough to an earlier question asked against the same collection and model is answered from the cache, skipping the
+    database search and the completion.  Entries expire after a time to live, the least recently used entries are
+    evicted when the cache is full, and the entries of a collection are dropped when it is written to.
+
+    Questions that differ only in an identifier, such as "What is CVE-2024-29943?" and "What is CVE-2024-29944?",
+    embed almost identically.  An answer is therefore only reused if both questions mention exactly the same
+    identifiers, the terms containing a digit such as CVE and CWE IDs and version numbers.
+
+    Notes:
+        Invalidation on writes only sees writes made through the same process, see iVectorDB.addWriteListener.
+        Collections re-ingested by another process are refreshed once their entries expire, or immediately by calling
+        invalidate.
+    """
+    def __init__(self, threshold: float=0.95, maxEntries: int=10000, ttlSeconds: float=86400):
+        """
+        Constructor for the cache.
+
+        Args:
+            threshold (float): The minimum cosine similarity between two questions for the answer of one to be reused
+                for the other.  Too low a threshold returns answers to different questions.
+            maxEntries (int): The maximum amount of cached answers across every collection and model.
+            ttlSeconds (float): The amount of seconds an answer is reused for.
+        """
+        self.threshold = threshold
+        self.maxEntries = maxEntries
+        self.ttlSeconds = ttlSeconds
+        self.hits = 0
+        self.misses = 0
+        # (collection, model) mapped to the question vectors of the partition
+        self._partitions = dict()
+        # Entry IDs mapped to their partition, answer, creation time and identifiers, in least recently used order
+        self._entries = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """
+        Scales an embedding to unit length so cosine similarity is a dot product.
+
+        Args:
+            embedding (list[float]): The embedding to scale.
+
+        Returns:
+            np.ndarray: The normalized float32 vector.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    @staticmethod
+    def identifiers(question: str) -> frozenset[str]:
+        """
+        Extracts the identifiers a question mentions, which must match exactly for an answer to be reused.
+
+        Args:
+            question (str): The question.
+
+        Returns:
+            frozenset[str]: The terms of the question containing a digit, see SparseEncoder.terms.
+        """
+        return frozenset(term for term in SparseEncoder.terms(question) if any(char.isdigit() for char in term))
+
+    def lookup(self, embedding: list[float], collectionName: str, model: str, question: str) -> str | None:
+        """
+        Finds the answer of the most similar earlier question mentioning the same identifiers.
+
+        Args:
+            embedding (list[float]): The embedding of the question.
+            collectionName (str): The collection the answer must have been built from.
+            model (str): The model, and any mode such as HyDE, the answer must have been created with.
+            question (str): The text of the question, whose identifiers must match those of the earlier question.
+
+        Returns:
+            str | None: The cached answer, or None if no earlier question is similar enough.
+        """
+        query = SemanticCache._normalize(embedding)
+        identifiers = SemanticCache.identifiers(question)
+        with self._lock:
+            partition = self._partitions.get((collectionName, model))
+            if partition is None or len(partition) == 0 or partition.dimensions != len(query):
+                self.misses += 1
+                return None
+
+            ids, similarities = partition.similarities(query)
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for row in candidates[np.argsort(similarities[candidates])[::-1]]:
+                id = int(ids[row])
+                if self._entries[id][3] != identifiers:
+                    continue
+                if monotonic() - self._entries[id][2] > self.ttlSeconds:
+                    self._remove(id)
+                    continue
+
+                self._entries.move_to_end(id)
+                self.hits += 1
+                return self._entries[id][1]
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding: list[float], collectionName: str, model: str, question: str, answer: str):
+        """
+        Caches the answer to a question.
+
+        Args:
+            embedding (list[float]): The embedding of the question.
+            collectionName (str): The collection the answer was built from.
+            model (str): The model, and any mode such as HyDE, the answer was created with.
+            question (str): The text of the question.
+            answer (str): The answer to cache.
+        """
+        vector = SemanticCache._normalize(embedding)
+        key = (collectionName, model)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None and partition.dimensions != len(vector):
+                # The collection was recreated with vectors of another size, the old entries cannot match anymore
+                for old in partition.rows:
+                    del self._entries[old]
+                partition = None
+            if partition is None:
+                partition = self._partitions[key] = _Partition(len(vector))
+
+            id = next(self._ids)
+            partition.add(id, vector)
+            self._entries[id] = (key, answer, monotonic(), SemanticCache.identifiers(question))
+
+            while len(self._entries) > self.maxEntries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, id: int):
+        """
+        Removes an entry.  Must be called with the lock held.
+
+        Args:
+            id (int): The ID of the entry to remove.
+        """
+        key = self._entries.pop(id)[0]
+        self._partitions[key].remove(id)
+
+    def invalidate(self, collectionName: str):
+        """
+        Drops every answer built from a collection, used when the collection is written to.
+
+        Args:
+            collectionName (str): The identifier of the collection.
+        """
+        with self._lock:
+            for key in [key for key in self._partitions if key[0] == collectionName]:
+                for id in self._partitions.pop(key).rows:
+                    del self._entries[id]
+
+    def clear(self):
+        """
+        Drops every answer.
+        """
+        with self._lock:
+            self._partitions = dict()
+            self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hitRate(self) -> float:
+        """
+        float: The fraction of lookups answered from the cache.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
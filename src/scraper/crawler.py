@@ -5,11 +5,13 @@ from typing import Any
 
 from .handlers import *
 from .iCrawler import iCrawler
+from .documentMetadata import writeDocumentMetadata
 
 import os
 import queue
 import re
 import requests
+import time
 import traceback
 
 class Crawler(iCrawler):
@@ -34,7 +36,8 @@ class Crawler(iCrawler):
                 already been visited. Used as a set since managers do not support sets.  Needs to be created with
                 Manager.dict() for multiprocessing.
             outputDirectory (str): The output directory for the crawl operation
-            recordUrl (bool): If True, the URL will be saved to a file
+            recordUrl (bool): If True, the content of the URL will be saved to a file, along with a metadata file
+                holding the URL, domain, MIME type and time of the download
             contentRegex (re.Pattern): A regex pattern to match documents with to extract the desired content for
                 writing to a file.  If set to None, all content will be recorded
             matchSkip (bool): If True and contentRegex is not None, then skip files that do not match the content regex
@@ -85,6 +88,9 @@ class Crawler(iCrawler):
                     else:
                         f.write(text)
 
+                # Saved next to the text so ingestion can filter chunks by where and when they were crawled
+                writeDocumentMetadata(filename, url, local_domain, contentType, int(time.time()))
+
             except Exception as e:
                 traceback.print_exc()
                 print("Unable to parse page " + url)
@@ -0,0 +1,64 @@
+from typing import Any
+import json
+import os
+
+# Appended to the path of a crawled text file to name the file holding its metadata
+METADATA_SUFFIX = ".meta.json"
+
+
+def writeDocumentMetadata(path: str, url: str, domain: str, contentType: str, crawledAt: int):
+    """
+    Saves the metadata of a crawled document next to its text file, so ingestion can store it with every chunk.
+
+    Args:
+        path (str): The path of the text file of the document.
+        url (str): The URL the document was downloaded from.
+        domain (str): The net location of the URL.
+        contentType (str): The MIME type the document was served with, which selected its handler.
+        crawledAt (int): The Unix time the document was downloaded at.
+    """
+    with open(path + METADATA_SUFFIX, "w", encoding="UTF-8") as file:
+        json.dump({"url": url, "domain": domain, "contentType": contentType, "crawledAt": crawledAt}, file)
+
+
+def readDocumentMetadata(path: str) -> dict[str, Any]:
+    """
+    Loads the metadata saved next to a text file by the crawler.
+
+    Args:
+        path (str): The path of the text file of the document.
+
+    Returns:
+        dict[str, Any]: The metadata of the document, empty if the file was not created by the crawler.
+    """
+    try:
+        with open(path + METADATA_SUFFIX, "r", encoding="UTF-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return dict()
+
+
+def isMetadataFile(path: str) -> bool:
+    """
+    Checks whether a file holds the metadata of another document rather than a document itself.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        bool: True if the file is a metadata file.
+    """
+    return path.endswith(METADATA_SUFFIX)
+
+
+def removeDocumentMetadata(path: str):
+    """
+    Deletes the metadata saved next to a text file, if there is any.
+
+    Args:
+        path (str): The path of the text file of the document.
+    """
+    try:
+        os.remove(path + METADATA_SUFFIX)
+    except FileNotFoundError:
+        pass
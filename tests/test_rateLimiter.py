@@ -0,0 +1,125 @@
+from src.embed.rateLimiter import RateLimitScheduler
+from types import SimpleNamespace
+import asyncio
+import pytest
+import time
+
+
+class RateLimited(Exception):
+    """
+    A 429 response, shaped like the status errors of the OpenAI client.
+    """
+    def __init__(self, retryAfter: float):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after": str(retryAfter)})
+
+
+class FakeEndpoint:
+    """
+    A local stand-in for the embedding API that rejects the first requests with a 429 and a Retry-After header.
+    """
+    def __init__(self, rejections: int=0, retryAfter: float=0.0, latency: float=0.01):
+        self.rejections = rejections
+        self.retryAfter = retryAfter
+        self.latency = latency
+        self.calls = []
+        self.inFlight = 0
+        self.peakInFlight = 0
+
+    async def embed(self, item: int) -> int:
+        self.calls.append((item, time.monotonic()))
+        self.inFlight += 1
+        self.peakInFlight = max(self.peakInFlight, self.inFlight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.rejections:
+                self.rejections -= 1
+                raise RateLimited(self.retryAfter)
+            return item
+        finally:
+            self.inFlight -= 1
+
+
+def testRateLimitedRequestsAreRetriedAfterRetryAfter():
+    endpoint = FakeEndpoint(rejections=2, retryAfter=0.1)
+    scheduler = RateLimitScheduler(baseDelay=0.001, maxDelay=0.001)
+
+    assert asyncio.run(scheduler.submit(lambda: endpoint.embed(7), retryOn=(RateLimited,))) == 7
+    assert scheduler.retries == 2
+    times = [called for _, called in endpoint.calls]
+    assert len(times) == 3
+    assert all(later - earlier >= 0.1 for earlier, later in zip(times, times[1:]))
+
+
+def testRetriesAreExhausted():
+    endpoint = FakeEndpoint(rejections=10)
+    scheduler = RateLimitScheduler(maxRetries=2, baseDelay=0.001, maxDelay=0.001)
+
+    with pytest.raises(RateLimited):
+        asyncio.run(scheduler.submit(lambda: endpoint.embed(1), retryOn=(RateLimited,)))
+    assert len(endpoint.calls) == 3
+
+
+def testOtherErrorsAreNotRetried():
+    endpoint = FakeEndpoint(rejections=1)
+    scheduler = RateLimitScheduler(baseDelay=0.001)
+
+    with pytest.raises(RateLimited):
+        asyncio.run(scheduler.submit(lambda: endpoint.embed(1), retryOn=(ConnectionError,)))
+    assert len(endpoint.calls) == 1
+
+
+def testSlotsAreHandedOutInOrder():
+    endpoint = FakeEndpoint()
+    scheduler = RateLimitScheduler(maxInFlight=2)
+
+    async def run():
+        return await asyncio.gather(*[scheduler.submit(lambda item=item: endpoint.embed(item)) for item in range(8)])
+
+    assert asyncio.run(run()) == list(range(8))
+    assert [item for item, _ in endpoint.calls] == list(range(8))
+    assert endpoint.peakInFlight == 2
+    assert scheduler._freeSlots == 2
+
+
+def testCancelledWaitersReleaseTheirSlot():
+    endpoint = FakeEndpoint(latency=0.05)
+    scheduler = RateLimitScheduler(maxInFlight=1)
+
+    async def run():
+        tasks = [asyncio.ensure_future(scheduler.submit(lambda item=item: endpoint.embed(item))) for item in range(4)]
+        await asyncio.sleep(0.01)
+        tasks[1].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[0] == 0 and results[2:] == [2, 3]
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert scheduler._freeSlots == 1 and not scheduler._waiters
+
+
+def testTokenBucketDelaysRequestsOverTheLimit():
+    endpoint = FakeEndpoint(latency=0)
+    # 10 tokens per second, the first request empties the bucket
+    scheduler = RateLimitScheduler(tokensPerMinute=600)
+
+    async def run():
+        await scheduler.submit(lambda: endpoint.embed(0), tokens=600)
+        await scheduler.submit(lambda: endpoint.embed(1), tokens=3)
+
+    asyncio.run(run())
+    (_, first), (_, second) = endpoint.calls
+    assert second - first >= 0.25
+
+
+def testRequestBucketDelaysRequestsOverTheLimit():
+    endpoint = FakeEndpoint(latency=0)
+    # 10 requests per second, a full bucket admits the first 600 at once
+    scheduler = RateLimitScheduler(requestsPerMinute=600)
+    scheduler.requestBucket.reserve(600)
+
+    start = time.monotonic()
+    asyncio.run(scheduler.submit(lambda: endpoint.embed(0)))
+    asyncio.run(scheduler.submit(lambda: endpoint.embed(1)))
+    # Each request waits a tenth of a second for the bucket to refill
+    assert time.monotonic() - start >= 0.18
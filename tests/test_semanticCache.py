@@ -0,0 +1,44 @@
+from src.model.semanticCache import SemanticCache
+import numpy as np
+
+
+def embedding(seed: int, noise: float=0.0) -> list[float]:
+    generator = np.random.default_rng(seed)
+    vector = generator.normal(size=64)
+    if noise:
+        vector = vector + np.random.default_rng(seed + 1000).normal(size=64) * noise
+    return vector.tolist()
+
+
+def testNeighbouringCVEsDoNotShareAnswers():
+    cache = SemanticCache(threshold=0.95)
+    # Questions about neighbouring CVEs embed almost identically
+    cache.store(embedding(1), "reports", "gpt", "What is CVE-2024-29943?", "Answer about 29943")
+
+    assert cache.lookup(embedding(1, 0.01), "reports", "gpt", "What is CVE-2024-29944?") is None
+    assert cache.lookup(embedding(1, 0.01), "reports", "gpt", "what is cve-2024-29943") == "Answer about 29943"
+
+
+def testIdentifiersPickTheMatchingEntry():
+    cache = SemanticCache(threshold=0.95)
+    cache.store(embedding(1), "reports", "gpt", "What is CVE-2024-29943?", "Answer about 29943")
+    cache.store(embedding(1, 0.01), "reports", "gpt", "What is CVE-2024-29944?", "Answer about 29944")
+
+    assert cache.lookup(embedding(1), "reports", "gpt", "What is CVE-2024-29944?") == "Answer about 29944"
+    assert cache.lookup(embedding(1), "reports", "gpt", "What is CVE-2024-29943?") == "Answer about 29943"
+
+
+def testRemovedRowsAreReused():
+    cache = SemanticCache(maxEntries=100)
+    for seed in range(300):
+        cache.store(embedding(seed), "reports", "gpt", f"Question {seed}", f"Answer {seed}")
+
+    partition = cache._partitions[("reports", "gpt")]
+    assert len(cache) == len(partition) == 100
+    assert partition.used <= 128
+    assert cache.lookup(embedding(299), "reports", "gpt", "Question 299") == "Answer 299"
+    assert cache.lookup(embedding(0), "reports", "gpt", "Question 0") is None
+
+    cache.invalidate("reports")
+    assert len(cache) == 0
+    assert cache.lookup(embedding(299), "reports", "gpt", "Question 299") is None